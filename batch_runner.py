@@ -0,0 +1,52 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+# set once per worker; under fork it is inherited instead of pickled
+_compiled = None
+
+
+def _init_worker(compiled):
+    global _compiled
+    _compiled = compiled
+
+
+def _run_chunk(words):
+    return _compiled.run_batch(words)
+
+
+def chunked(words, chunk_size):
+    it = iter(words)
+    while True:
+        chunk = list(islice(it, chunk_size))
+        if not chunk: return
+        yield chunk
+
+
+def iter_results(engine, words, workers=None, chunk_size=10000):
+    compiled = engine.compile()
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for chunk in chunked(words, chunk_size):
+            yield compiled.run_batch(chunk)
+        return
+
+    methods = multiprocessing.get_all_start_methods()
+    ctx = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker, initargs=(compiled,)) as pool:
+        # keep a bounded window of chunks in flight so huge inputs are never fully buffered
+        pending = deque()
+        for chunk in chunked(words, chunk_size):
+            pending.append(pool.submit(_run_chunk, chunk))
+            if len(pending) >= workers * 2: yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def accepts_parallel(engine, words, workers=None, chunk_size=10000):
+    results = []
+    for chunk in iter_results(engine, words, workers, chunk_size):
+        results.extend(chunk)
+    return results
@@ -0,0 +1,218 @@
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from nfa_engine import NFAEngine
+from nfa_io import parse_nfa
+from nfa_trace import TraceTree
+
+
+# --- Synthetic automata ---
+def make_engine(n, alphabet, edges, starts=('1',), finals=None):
+    engine = NFAEngine()
+    engine.alphabet = set(alphabet)
+    engine.states_count = n
+    engine.start_states = set(starts)
+    engine.final_states = set(finals or (str(n),))
+    for u, sym, v in edges:
+        engine.add_transition(u, sym, v)
+    return engine
+
+
+def random_nfa(n=200, alphabet='ab', out_degree=3, eps_ratio=0.1, seed=0):
+    rng = random.Random(seed)
+    edges = []
+    for u in range(1, n + 1):
+        for _ in range(out_degree):
+            sym = '#' if rng.random() < eps_ratio else rng.choice(alphabet)
+            edges.append((str(u), sym, str(rng.randint(1, n))))
+    return make_engine(n, alphabet, edges, finals=[str(i) for i in rng.sample(range(1, n + 1), max(1, n // 10))])
+
+
+def epsilon_chain(n=500, alphabet='ab'):
+    # long '#' chains with a back edge, so every closure is large
+    edges = [(str(u), '#', str(u + 1)) for u in range(1, n)]
+    edges.append((str(n), '#', '1'))
+    edges += [(str(u), alphabet[u % len(alphabet)], str(u % n + 1)) for u in range(1, n + 1, 7)]
+    return make_engine(n, alphabet, edges)
+
+
+def nth_from_end(k=12):
+    # "the k-th symbol from the end is a": k + 1 NFA states, 2^k DFA states
+    n = k + 1
+    edges = [('1', 'a', '1'), ('1', 'b', '1'), ('1', 'a', '2')]
+    for u in range(2, n):
+        edges += [(str(u), 'a', str(u + 1)), (str(u), 'b', str(u + 1))]
+    return make_engine(n, 'ab', edges)
+
+
+def large_alphabet(n=300, symbols=200, out_degree=4, seed=0):
+    rng = random.Random(seed)
+    alphabet = [chr(0x100 + i) for i in range(symbols)]
+    edges = [(str(u), rng.choice(alphabet), str(rng.randint(1, n))) for u in range(1, n + 1) for _ in range(out_degree)]
+    return make_engine(n, alphabet, edges)
+
+
+def random_words(alphabet, count, length, seed=1):
+    rng = random.Random(seed)
+    alphabet = sorted(alphabet)
+    return [''.join(rng.choice(alphabet) for _ in range(length)) for _ in range(count)]
+
+
+def to_text(engine):
+    return '\n'.join(f"{u},{sym},{v}" for (u, sym), targets in engine.transitions.items() for v in targets)
+
+
+# --- Measurement ---
+MIN_TIME = 0.2
+
+
+def timed(fn, number):
+    t0 = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return time.perf_counter() - t0
+
+
+def measure(fn, repeat=5):
+    # seconds per call: as in timeit.autorange, calls are batched until one sample lasts MIN_TIME, and the
+    # median of `repeat` samples is kept; then one extra run under tracemalloc for the peak (tracing skews
+    # timings)
+    number = 1
+    while True:
+        t = timed(fn, number)
+        if t >= MIN_TIME: break
+        number = max(number * 2, int(number * MIN_TIME * 1.2 / t) if t > 0 else 0)
+    samples = [t / number] + [timed(fn, number) / number for _ in range(repeat - 1)]
+    per_call = statistics.median(samples)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return per_call, peak
+
+
+def bench_closure(engine):
+    states = [str(i) for i in range(1, engine.states_count + 1)]
+
+    def run():
+        engine.closure_table = None
+        for s in states:
+            engine.get_epsilon_closure((s,))
+
+    t, peak = measure(run)
+    return {'closures_per_sec': len(states) / t, 'peak_bytes': peak}
+
+
+def bench_accept(engine, words, mode='nfa'):
+    chars = sum(len(w) for w in words)
+    engine.mode = mode
+    engine.compile()
+
+    def run():
+        for w in words:
+            engine.accepts(w)
+
+    t, peak = measure(run)
+    engine.mode = 'nfa'
+    return {'strings_per_sec': len(words) / t, 'chars_per_sec': chars / t, 'peak_bytes': peak}
+
+
+def bench_accept_many(engine, words):
+    chars = sum(len(w) for w in words)
+    engine.compile()
+    t, peak = measure(lambda: engine.accepts_many(words))
+    return {'strings_per_sec': len(words) / t, 'chars_per_sec': chars / t, 'peak_bytes': peak}
+
+
+def bench_trace(engine, word, node_budget=20000):
+    def run():
+        TraceTree(engine, word, node_budget=node_budget).build_all()
+
+    t, peak = measure(run)
+    return {'chars_per_sec': len(word) / t, 'peak_bytes': peak}
+
+
+def bench_parse(engine):
+    text = to_text(engine)
+    lines = text.count('\n') + 1
+    alphabet = ','.join(sorted(engine.alphabet))
+    starts = ','.join(sorted(engine.start_states))
+    finals = ','.join(sorted(engine.final_states))
+    t, peak = measure(lambda: parse_nfa(alphabet, str(engine.states_count), starts, finals, text))
+    return {'lines_per_sec': lines / t, 'peak_bytes': peak}
+
+
+def run_suite(quick=False):
+    scale = 0.2 if quick else 1.0
+    count, length = int(2000 * scale), 50
+    automata = {
+        'random': random_nfa(int(500 * scale) or 10),
+        'epsilon_chain': epsilon_chain(int(1000 * scale) or 10),
+        'nth_from_end': nth_from_end(12),
+        'large_alphabet': large_alphabet(int(500 * scale) or 10),
+    }
+    results = {}
+    for name, engine in automata.items():
+        words = random_words(engine.alphabet, count, length)
+        results[f'{name}/closure'] = bench_closure(engine)
+        results[f'{name}/accept'] = bench_accept(engine, words)
+        results[f'{name}/accept_lazy_dfa'] = bench_accept(engine, words, 'lazy_dfa')
+        results[f'{name}/accept_many'] = bench_accept_many(engine, words)
+        results[f'{name}/trace'] = bench_trace(engine, random_words(engine.alphabet, 1, 200, seed=2)[0])
+        results[f'{name}/parse'] = bench_parse(engine)
+    return results
+
+
+# --- Baselines ---
+def compare(results, baseline, tolerance):
+    regressions = []
+    for key, metrics in results.items():
+        old = baseline.get('results', {}).get(key)
+        if not old: continue
+        for metric, value in metrics.items():
+            if metric == 'peak_bytes' or metric not in old: continue
+            if value < old[metric] * (1 - tolerance):
+                regressions.append(f"{key} {metric}: {value:,.0f} vs baseline {old[metric]:,.0f}")
+        if 'peak_bytes' in old and metrics['peak_bytes'] > old['peak_bytes'] * (1 + tolerance):
+            regressions.append(f"{key} peak_bytes: {metrics['peak_bytes']:,} vs baseline {old['peak_bytes']:,}")
+    return regressions
+
+
+def main(argv=None):
+    global MIN_TIME
+    parser = argparse.ArgumentParser(description="Benchmark the NFA engine and tracer hot paths.")
+    parser.add_argument('--quick', action='store_true', help="smaller automata and corpora")
+    parser.add_argument('--save', metavar='PATH', help="write results as a JSON baseline")
+    parser.add_argument('--compare', metavar='PATH', help="compare against a JSON baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed relative slowdown (default 0.2)")
+    parser.add_argument('--min-time', type=float, default=MIN_TIME,
+                        help=f"seconds per timing sample (default {MIN_TIME})")
+    args = parser.parse_args(argv)
+    MIN_TIME = args.min_time
+
+    results = run_suite(args.quick)
+    for key, metrics in results.items():
+        cols = '  '.join(f"{m}={v:,.0f}" for m, v in metrics.items())
+        print(f"{key:32} {cols}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(), 'quick': args.quick,
+                       'results': results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print("REGRESSION", line)
+        if regressions: return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
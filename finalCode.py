@@ -1,54 +1,40 @@
 import tkinter as tk
-from tkinter import messagebox, Toplevel
+from tkinter import filedialog, messagebox, Toplevel
 import math
 
+from nfa_engine import NFAEngine
+from nfa_io import parse_nfa
+from nfa_layout import (ForceLayout, automaton_key, cached_layout, circle_layout, layered_layout,
+                        store_layout)
+from nfa_trace import ARROW, TraceTree, export_trace, trace_primitives
+from nfa_worker import BackgroundTask, Cancelled
 
-class NFAEngine:
-    def __init__(self):
-        self.alphabet = set()
-        self.transitions = {}
-        self.start_states = set()
-        self.final_states = set()
-        self.states_count = 0
-
-    def add_transition(self, u, sym, v):
-        key = (u, sym)
-        if key not in self.transitions:
-            self.transitions[key] = set()
-        self.transitions[key].add(v)
-
-    def get_epsilon_closure(self, states):
-        stack = list(states)
-        closure = set(states)
-        while stack:
-            u = stack.pop()
-            if (u, '#') in self.transitions:
-                for v in self.transitions[(u, '#')]:
-                    if v not in closure:
-                        closure.add(v)
-                        stack.append(v)
-        return closure
-
-    def reset_simulation(self, start_nodes, input_str):
-        self.start_states = start_nodes
-        self.input_string = input_str
-        self.current_states = self.get_epsilon_closure(self.start_states)
+
+# --- Background Work ---
+def accepts_in_steps(engine, word, task, chunk=1000):
+    # fed in slices so the run reports progress and stops at the next slice once cancelled
+    matcher = engine.stream()
+    for k in range(0, len(word), chunk):
+        task.progress(k / len(word), "Running")
+        matcher.feed(word[k:k + chunk])
+    return matcher.finish()
 
 
 # --- Trace Window ---
 class TraceWindow(Toplevel):
-    def __init__(self, master, engine, input_string):
+    def __init__(self, master, engine, input_string, dag=False, node_budget=5000):
         super().__init__(master)
         self.title("Trace Input (Computation Tree)")
         self.geometry("1100x800")
         self.engine = engine
         self.input_string = input_string
 
-        self.levels = []
-        self.node_id_counter = 0
+        self.tree = TraceTree(engine, input_string, dag, node_budget)
         self.current_level_index = 0
-
-        self.prepare_trace_data()
+        self.task = None
+        # canvas items are recycled between renders; only what is in view exists
+        self.pools = {'line': [], 'oval': [], 'text': []}
+        self.render_pending = False
 
         ctrl_frame = tk.Frame(self, bg="#eee", pady=5)
         ctrl_frame.pack(side=tk.TOP, fill=tk.X)
@@ -56,173 +42,281 @@ class TraceWindow(Toplevel):
         self.btn_next = tk.Button(ctrl_frame, text="Show Next Step", command=self.draw_next_level, bg="#2196F3",
                                   fg="white", font=("Arial", 11, "bold"))
         self.btn_next.pack()
-
-        self.canvas = tk.Canvas(self, bg="white", scrollregion=(0, 0, 3000, 5000))
-        hbar = tk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.canvas.xview)
+        self.btn_export = tk.Button(ctrl_frame, text="Export...", command=self.export, font=("Arial", 9))
+        self.btn_export.pack()
+        self.btn_cancel = tk.Button(ctrl_frame, text="Cancel", command=self.cancel_task, state=tk.DISABLED,
+                                    font=("Arial", 9))
+        self.btn_cancel.pack()
+        self.lbl_budget = tk.Label(ctrl_frame, bg="#eee", font=("Arial", 9))
+        self.lbl_budget.pack()
+
+        self.canvas = tk.Canvas(self, bg="white", scrollregion=(0, 0, *self.tree.extent()))
+        hbar = tk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.on_xview)
         hbar.pack(side=tk.BOTTOM, fill=tk.X)
-        vbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.canvas.yview)
+        vbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.on_yview)
         vbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.canvas.config(xscrollcommand=hbar.set, yscrollcommand=vbar.set)
         self.canvas.pack(side=tk.LEFT, expand=True, fill=tk.BOTH)
+        self.canvas.bind("<Configure>", lambda e: self.schedule_render())
+        self.protocol("WM_DELETE_WINDOW", self.close)
 
-        self.canvas.create_text(60, 40, text="Start", font=("Arial", 14, "bold"), fill="black")
         self.draw_next_level()
 
-    def get_id(self):
-        self.node_id_counter += 1
-        return self.node_id_counter
-
-    def prepare_trace_data(self):
-        level0_nodes = []
-        for s in sorted(list(self.engine.start_states)):
-            level0_nodes.append({'id': self.get_id(), 'state': s, 'parent_ids': [], 'link_type': None})
-
-        queue = list(level0_nodes)
-        processed_pairs = set()
-        idx = 0
-
-        while idx < len(queue):
-            curr_node = queue[idx]
-            idx += 1
-            state = curr_node['state']
-            if (state, '#') in self.engine.transitions:
-                targets = self.engine.transitions[(state, '#')]
-                for t in targets:
-                    if (curr_node['id'], t) not in processed_pairs:
-                        processed_pairs.add((curr_node['id'], t))
-                        new_node = {'id': self.get_id(), 'state': t, 'parent_ids': [curr_node['id']],
-                                    'link_type': 'horizontal'}
-                        level0_nodes.append(new_node)
-                        queue.append(new_node)
-
-        self.levels.append({'nodes': level0_nodes, 'char': 'Start'})
-        current_level_nodes = level0_nodes
-
-        total_chars = len(self.input_string)
-        for i, char in enumerate(self.input_string):
-            next_level_nodes = []
-            is_last_step = (i == total_chars - 1)
-            merged_states_map = {}
-
-            for parent in current_level_nodes:
-                p_state = parent['state']
-                if (p_state, char) in self.engine.transitions:
-                    targets = self.engine.transitions[(p_state, char)]
-                    for t in targets:
-                        if is_last_step:
-                            if t in merged_states_map:
-                                existing_node = merged_states_map[t]
-                                existing_node['parent_ids'].append(parent['id'])
-                                continue
-                        new_node = {'id': self.get_id(), 'state': t, 'parent_ids': [parent['id']],
-                                    'link_type': 'vertical'}
-                        next_level_nodes.append(new_node)
-                        if is_last_step: merged_states_map[t] = new_node
-
-            queue = list(next_level_nodes)
-            idx = 0
-            processed_pairs = set()
-            while idx < len(queue):
-                curr_node = queue[idx]
-                idx += 1
-                state = curr_node['state']
-                if (state, '#') in self.engine.transitions:
-                    targets = self.engine.transitions[(state, '#')]
-                    for t in targets:
-                        if (curr_node['id'], t) not in processed_pairs:
-                            processed_pairs.add((curr_node['id'], t))
-                            new_node = {'id': self.get_id(), 'state': t, 'parent_ids': [curr_node['id']],
-                                        'link_type': 'horizontal'}
-                            next_level_nodes.append(new_node)
-                            queue.append(new_node)
-
-            self.levels.append({'nodes': next_level_nodes, 'char': char})
-            current_level_nodes = next_level_nodes
+    def update_budget_label(self):
+        text = f"Nodes: {self.tree.node_count} / {self.tree.node_budget}"
+        if self.tree.truncated:
+            self.lbl_budget.config(text=text + "  (truncated: node budget reached)", fg="#c62828")
+        else:
+            self.lbl_budget.config(text=text, fg="#555")
 
     def draw_next_level(self):
-        if self.current_level_index >= len(self.levels): return
+        if self.current_level_index >= self.tree.total_levels or self.task is not None: return
+        self.btn_next.config(state=tk.DISABLED, text="Building...")
+        tree = self.tree
         i = self.current_level_index
-        data = self.levels[i]
-
-        row_height = 120
-        top_margin = 80
-        line_y = top_margin + (i * row_height)
-        r = 20
-        self.canvas.create_line(20, line_y, 2900, line_y, fill="#90caf9", width=2)
-
-        if i < len(self.levels) - 1:
-            next_char = self.levels[i + 1]['char']
-            self.canvas.create_text(60, line_y + (row_height / 2), text=next_char, font=("Arial", 16, "bold"),
-                                    fill="#1565c0")
-
-        nodes = data['nodes']
-        count = len(nodes)
-        if not hasattr(self, 'all_coords'): self.all_coords = {}
-        if i not in self.all_coords: self.all_coords[i] = {}
-
-        if count > 0:
-            nodes.sort(key=lambda x: x['parent_ids'][0] if x['parent_ids'] else -1)
-            width_span = max(600, count * 100)
-            spacing = width_span / (count + 1)
-            offset_x = (1000 - width_span) / 2 if width_span < 1000 else 50
-
-            for j, node in enumerate(nodes):
-                x = offset_x + spacing * (j + 1)
-                self.all_coords[i][node['id']] = (x, line_y)
-
-                for pid in node['parent_ids']:
-                    parent_coords = None
-                    if node['link_type'] == 'vertical':
-                        if (i - 1) in self.all_coords: parent_coords = self.all_coords[i - 1].get(pid)
-                    else:
-                        parent_coords = self.all_coords[i].get(pid)
-
-                    if parent_coords:
-                        px, py = parent_coords
-                        if node['link_type'] == 'vertical':
-                            self.canvas.create_line(px, py + r, x, line_y - r, arrow=tk.LAST, arrowshape=(14, 16, 6),
-                                                    fill="black", width=2)
-                        else:
-                            if x > px:
-                                sx, ex = px + r, x - r
-                            else:
-                                sx, ex = px - r, x + r
-                            mid_x = (sx + ex) / 2
-                            mid_y = line_y - 45
-                            self.canvas.create_line(sx, py - r / 2, mid_x, mid_y, ex, line_y - r / 2, smooth=True,
-                                                    arrow=tk.LAST, arrowshape=(14, 16, 6), fill="red", width=2,
-                                                    dash=(4, 2))
-                            self.canvas.create_text(mid_x, mid_y - 10, text="λ", fill="red", font=("Times", 14, "bold"))
-
-        for node in nodes:
-            x, y = self.all_coords[i][node['id']]
-            state_name = node['state']
-            fill = "white"
-            outline = "black"
-            width = 1
-            if i == len(self.levels) - 1:
-                if state_name in self.engine.final_states:
-                    fill = "#c8e6c9"
-                    outline = "#2e7d32"
-                    width = 2
-
-            self.canvas.create_oval(x - r, y - r, x + r, y + r, fill=fill, outline=outline, width=width)
-            if state_name in self.engine.final_states:
-                inner_col = "#2e7d32" if (i == len(self.levels) - 1) else "black"
-                self.canvas.create_oval(x - (r - 5), y - (r - 5), x + (r - 5), y + (r - 5), fill=None,
-                                        outline=inner_col, width=1)
-            self.canvas.create_text(x, y, text=str(state_name), font=("Arial", 11, "bold"))
 
+        def work(task):
+            # an export may already have built levels that are not shown yet
+            data = tree.levels[i] if i < len(tree.levels) else tree.next_level(task.progress)
+            if i < tree.total_levels - 1: return data, None
+            # a truncated tree cannot decide acceptance, so the input is run separately
+            return data, accepts_in_steps(self.engine, self.input_string, task) if tree.truncated else tree.accepted()
+
+        self.run_task(work, self.on_level_ready, self.on_level_error)
+
+    def run_task(self, work, on_done, on_error):
+        # one task at a time: a cancelled task keeps the slot until its thread has actually stopped,
+        # since the next one would build on the same tree
+        def done(result):
+            self.task = None
+            if not self.winfo_exists(): return
+            self.btn_cancel.config(state=tk.DISABLED)
+            on_done(result)
+
+        def failed(error):
+            self.task = None
+            if not self.winfo_exists(): return
+            self.btn_cancel.config(state=tk.DISABLED)
+            on_error(error)
+
+        def progress(fraction, text):
+            if self.winfo_exists(): self.lbl_budget.config(text=f"{text}... {int(fraction * 100)}%", fg="#555")
+
+        self.task = BackgroundTask(work, on_done=done, on_error=failed, on_progress=progress)
+        self.btn_cancel.config(state=tk.NORMAL)
+        # polled from the main window: this one may be closed while the task winds down
+        self.task.start(self.master)
+
+    def cancel_task(self):
+        if self.task is None: return
+        self.task.cancel()
+        self.btn_cancel.config(state=tk.DISABLED)
+        self.lbl_budget.config(text="Cancelling...", fg="#555")
+
+    def close(self):
+        if self.task is not None: self.task.cancel()
+        if self.render_pending: self.after_cancel(self.render_job)
+        self.destroy()
+
+    def on_level_ready(self, result):
+        self.btn_next.config(state=tk.NORMAL, text="Show Next Step")
+        self.draw_level(*result)
+
+    def on_level_error(self, error):
+        self.btn_next.config(state=tk.NORMAL, text="Show Next Step")
+        self.update_budget_label()
+        if not isinstance(error, Cancelled): messagebox.showerror("Trace Error", str(error), parent=self)
+
+    def draw_level(self, data, accepted):
+        self.update_budget_label()
         self.current_level_index += 1
-        if self.current_level_index >= len(self.levels):
+        self.canvas.config(scrollregion=(0, 0, *self.tree.extent(self.current_level_index)))
+        self.render()
+
+        if self.current_level_index >= self.tree.total_levels:
             self.btn_next.config(state=tk.DISABLED, text="End of Trace")
-            accepted = any(n['state'] in self.engine.final_states for n in self.levels[-1]['nodes'])
 
             if accepted:
                 messagebox.showinfo("Result", "Input ACCEPTED")
             else:
                 messagebox.showwarning("Result", "Input REJECTED")
 
+    def on_xview(self, *args):
+        self.canvas.xview(*args)
+        self.schedule_render()
+
+    def on_yview(self, *args):
+        self.canvas.yview(*args)
+        self.schedule_render()
+
+    def schedule_render(self):
+        if self.render_pending: return
+        self.render_pending = True
+        self.render_job = self.after_idle(self.render)
+
+    def render(self):
+        self.render_pending = False
+        c = self.canvas
+        x0, y0 = c.canvasx(0), c.canvasy(0)
+        view = (x0, y0, x0 + c.winfo_width(), y0 + c.winfo_height())
+        used = {kind: 0 for kind in self.pools}
+        for kind, coords, opts in trace_primitives(self.tree, self.current_level_index, view):
+            pool = self.pools[kind]
+            n = used[kind]
+            used[kind] = n + 1
+            if n == len(pool):
+                pool.append(getattr(c, 'create_' + kind)(*coords, tags=kind + '_item'))
+            item = pool[n]
+            c.coords(item, *coords)
+            if kind == 'line':
+                c.itemconfig(item, state=tk.NORMAL, fill=opts['fill'], width=opts['width'],
+                             arrow=tk.LAST if opts.get('arrow') else tk.NONE, arrowshape=ARROW,
+                             dash=(4, 2) if opts.get('dash') else "", smooth=opts.get('smooth', False))
+            else:
+                c.itemconfig(item, state=tk.NORMAL, **opts)
+        # lines go below ovals, ovals below labels
+        c.tag_raise('oval_item')
+        c.tag_raise('text_item')
+        for kind, pool in self.pools.items():
+            for item in pool[used[kind]:]:
+                c.itemconfig(item, state=tk.HIDDEN)
+
+    def export(self):
+        if self.task is not None: return
+        path = filedialog.asksaveasfilename(parent=self, title="Export Trace", defaultextension=".svg",
+                                            filetypes=[("SVG image", "*.svg"), ("PostScript", "*.ps *.eps")])
+        if not path: return
+        self.btn_next.config(state=tk.DISABLED)
+        self.btn_export.config(state=tk.DISABLED, text="Exporting...")
+        tree = self.tree
+
+        # the whole trace (up to the node budget) is written from the level data, never drawn on screen
+        def work(task):
+            tree.build_all(task.progress)
+            export_trace(tree, path)
+            return path
+
+        self.run_task(work, self.on_export_done, self.on_export_error)
+
+    def export_finished(self):
+        self.btn_export.config(state=tk.NORMAL, text="Export...")
+        if self.current_level_index < self.tree.total_levels: self.btn_next.config(state=tk.NORMAL)
+        self.update_budget_label()
+
+    def on_export_done(self, path):
+        self.export_finished()
+        messagebox.showinfo("Export", f"Trace saved to {path}", parent=self)
+
+    def on_export_error(self, error):
+        self.export_finished()
+        if not isinstance(error, Cancelled): messagebox.showerror("Export Error", str(error), parent=self)
+
+
+# --- Spatial Index ---
+class SpatialGrid:
+    # uniform grid bucketing of node positions for hit-testing and viewport queries
+    def __init__(self, cell=100):
+        self.cell = cell
+        self.cells = {}
+        self.pos = {}
+
+    def key(self, x, y):
+        return int(x // self.cell), int(y // self.cell)
+
+    def insert(self, item, x, y):
+        self.pos[item] = (x, y)
+        self.cells.setdefault(self.key(x, y), set()).add(item)
+
+    def move(self, item, x, y):
+        old = self.pos.get(item)
+        if old is not None:
+            k = self.key(*old)
+            if k == self.key(x, y):
+                self.pos[item] = (x, y)
+                return
+            bucket = self.cells[k]
+            bucket.discard(item)
+            if not bucket: del self.cells[k]
+        self.insert(item, x, y)
+
+    def query(self, x0, y0, x1, y1):
+        (cx0, cy0), (cx1, cy1) = self.key(x0, y0), self.key(x1, y1)
+        found = []
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self.cells):
+            buckets = [b for k, b in self.cells.items() if cx0 <= k[0] <= cx1 and cy0 <= k[1] <= cy1]
+        else:
+            buckets = [self.cells[(i, j)] for i in range(cx0, cx1 + 1) for j in range(cy0, cy1 + 1)
+                       if (i, j) in self.cells]
+        for bucket in buckets:
+            for item in bucket:
+                x, y = self.pos[item]
+                if x0 <= x <= x1 and y0 <= y <= y1: found.append(item)
+        return found
+
+    def nearest(self, x, y, radius):
+        closest, min_dist = None, float('inf')
+        for item in self.query(x - radius, y - radius, x + radius, y + radius):
+            ix, iy = self.pos[item]
+            dist = math.hypot(x - ix, y - iy)
+            if dist < radius and dist < min_dist: min_dist, closest = dist, item
+        return closest
+
+
+class BoxGrid:
+    # grid bucketing of bounding boxes (edges) for viewport queries; a hierarchy of ever coarser grids, each
+    # box filed in the first level whose cells are at least its size, so it sits in at most four cells
+    def __init__(self, cell=100):
+        self.cell = cell
+        self.levels = {}
+        self.boxes = {}
+
+    def level(self, x0, y0, x1, y1):
+        level, size = 0, self.cell
+        while max(x1 - x0, y1 - y0) > size:
+            level, size = level + 1, size * 2
+        return level, size
+
+    def keys(self, size, x0, y0, x1, y1):
+        return [(i, j) for i in range(int(x0 // size), int(x1 // size) + 1)
+                for j in range(int(y0 // size), int(y1 // size) + 1)]
+
+    def insert(self, item, x0, y0, x1, y1):
+        self.boxes[item] = (x0, y0, x1, y1)
+        level, size = self.level(x0, y0, x1, y1)
+        cells = self.levels.setdefault(level, {})
+        for k in self.keys(size, x0, y0, x1, y1):
+            cells.setdefault(k, set()).add(item)
+
+    def remove(self, item):
+        box = self.boxes.pop(item, None)
+        if box is None: return
+        level, size = self.level(*box)
+        cells = self.levels[level]
+        for k in self.keys(size, *box):
+            bucket = cells[k]
+            bucket.discard(item)
+            if not bucket: del cells[k]
+
+    def move(self, item, x0, y0, x1, y1):
+        self.remove(item)
+        self.insert(item, x0, y0, x1, y1)
+
+    def query(self, x0, y0, x1, y1):
+        found = set()
+        for level, cells in self.levels.items():
+            size = self.cell * 2 ** level
+            cx0, cy0, cx1, cy1 = int(x0 // size), int(y0 // size), int(x1 // size), int(y1 // size)
+            if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(cells):
+                buckets = [b for k, b in cells.items() if cx0 <= k[0] <= cx1 and cy0 <= k[1] <= cy1]
+            else:
+                buckets = [cells[(i, j)] for i in range(cx0, cx1 + 1) for j in range(cy0, cy1 + 1)
+                           if (i, j) in cells]
+            for bucket in buckets:
+                for item in bucket:
+                    bx0, by0, bx1, by1 = self.boxes[item]
+                    if bx0 <= x1 and x0 <= bx1 and by0 <= y1 and y0 <= by1: found.add(item)
+        return found
+
 
 # --- Main GUI ---
 class NFAGUI:
@@ -239,6 +333,21 @@ class NFAGUI:
         self.node_radius = 25
         self.arrow_style = (20, 25, 8)
         self.drag_data = {"item": None, "x": 0, "y": 0}
+        self.drag_pending = False
+        self.layout_center = (400, 300)
+        self.force = None
+        self.layout_key = None
+        self.task = None
+        self.zoom = 1.0
+        self.scroll_bounds = (0, 0, 800, 600)
+        self.grid = SpatialGrid()
+        self.edge_grid = BoxGrid()
+        self.render_pending = False
+        self.grouped = {}
+        self.edge_items = {}
+        self.node_items = {}
+        self.free = {'line': [], 'oval': [], 'text': []}
+        self.incident = {}
 
         # --- REORGANIZED LAYOUT ---
         # 1. Visualization (TOP)
@@ -250,13 +359,22 @@ class NFAGUI:
         menu_frame.pack(side=tk.BOTTOM, fill=tk.X)
 
         # --- Visualization Content ---
-        tk.Label(visualization_frame, text="State Diagram (Interactive: Drag nodes to arrange)", bg="white",
-                 fg="#888").pack(side=tk.TOP, fill=tk.X)
+        tk.Label(visualization_frame, text="State Diagram (Interactive: Drag nodes to arrange, Ctrl+Wheel to zoom)",
+                 bg="white", fg="#888").pack(side=tk.TOP, fill=tk.X)
         self.canvas = tk.Canvas(visualization_frame, bg="white")
+        hbar = tk.Scrollbar(visualization_frame, orient=tk.HORIZONTAL, command=self.on_xscroll)
+        hbar.pack(side=tk.BOTTOM, fill=tk.X)
+        vbar = tk.Scrollbar(visualization_frame, orient=tk.VERTICAL, command=self.on_yscroll)
+        vbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.config(xscrollcommand=hbar.set, yscrollcommand=vbar.set)
         self.canvas.pack(expand=True, fill=tk.BOTH)
 
         self.canvas.bind("<ButtonPress-1>", self.on_press)
         self.canvas.bind("<B1-Motion>", self.on_drag)
+        self.canvas.bind("<Configure>", lambda e: self.schedule_render())
+        self.canvas.bind("<Control-MouseWheel>", lambda e: self.zoom_by(1.1 if e.delta > 0 else 1 / 1.1))
+        self.canvas.bind("<Control-Button-4>", lambda e: self.zoom_by(1.1))
+        self.canvas.bind("<Control-Button-5>", lambda e: self.zoom_by(1 / 1.1))
 
         # --- Menu Content (Input Groups) ---
 
@@ -290,6 +408,10 @@ class NFAGUI:
         m_txt.add_command(label="Paste", command=lambda: self.t_trans.event_generate("<<Paste>>"))
         self.t_trans.bind("<Button-3>", lambda e: m_txt.tk_popup(e.x_root, e.y_root))
 
+        tk.Label(grp_def, text="Layout:", bg=self.bg_color, anchor="w").pack(fill=tk.X)
+        self.layout_var = tk.StringVar(value="Layered")
+        tk.OptionMenu(grp_def, self.layout_var, "Layered", "Force-directed", "Circle").pack(fill=tk.X)
+
         tk.Button(grp_def, text="Load NFA & Draw Diagram", command=self.load_nfa,
                   bg="#4CAF50", fg="white", font=("Segoe UI", 10, "bold"), height=2, cursor="hand2").pack(fill=tk.X,
                                                                                                           pady=10)
@@ -303,6 +425,9 @@ class NFAGUI:
         grp_sim.pack(fill=tk.X)
 
         self.e_string = add_field(grp_sim, "Input String:", "")
+        self.dag_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(grp_sim, text="Merge equal states per level (DAG)", variable=self.dag_var,
+                       bg=self.bg_color, anchor="w").pack(fill=tk.X)
 
         tk.Button(grp_sim, text="Trace Input (Tree View)", command=self.open_trace,
                   bg="#2196F3", fg="white", font=("Segoe UI", 10, "bold"), height=2, cursor="hand2").pack(fill=tk.X,
@@ -312,201 +437,415 @@ class NFAGUI:
         self.lbl_res = tk.Label(right_menu_subframe, text="Ready", bg="#e0e0e0", fg="#333",
                                 font=("Segoe UI", 12, "bold"), pady=10, relief=tk.RIDGE)
         self.lbl_res.pack(fill=tk.X, pady=(10, 0))
+        self.btn_cancel = tk.Button(right_menu_subframe, text="Cancel", command=self.cancel_task, state=tk.DISABLED)
+        self.btn_cancel.pack(fill=tk.X, pady=(5, 0))
 
     # --- Logic ---
+    def to_world(self, event):
+        return self.canvas.canvasx(event.x) / self.zoom, self.canvas.canvasy(event.y) / self.zoom
+
+    def to_view(self, pts):
+        return [p * self.zoom for p in pts]
+
     def on_press(self, event):
-        closest, min_dist = None, float('inf')
-        for sid, (x, y) in self.node_coords.items():
-            dist = math.hypot(event.x - x, event.y - y)
-            if dist < self.node_radius + 10 and dist < min_dist: min_dist, closest = dist, sid
+        self.force = None
+        x, y = self.to_world(event)
+        closest = self.grid.nearest(x, y, self.node_radius + 10)
         if closest: self.drag_data["item"] = closest
 
     def on_drag(self, event):
         if self.drag_data["item"]:
-            self.node_coords[self.drag_data["item"]] = (event.x, event.y)
-            self.draw_nfa(False)
-
-    def load_nfa(self):
-        try:
-            self.engine = NFAEngine()
-
-            # Alphabet
-            raw_alpha = self.e_alphabet.get().split(',')
-            self.engine.alphabet = set(x.strip() for x in raw_alpha if x.strip())
-
-            if not self.engine.alphabet: raise ValueError("Alphabet cannot be empty!")
-
-            # States - Enhanced Error
-            states_val = self.e_states.get().strip()
-            if not states_val.isdigit():
-                raise ValueError(
-                    f"Error in 'Number of States':\nExpected an integer (e.g., 4), but you entered '{states_val}'.")
-
-            self.engine.states_count = int(states_val)
-
-            if self.engine.states_count > 10:
-                messagebox.showwarning("Warning",
-                                       f"You have {self.engine.states_count} states, which exceeds the recommended limit of 10.\n\nThe diagram might be cluttered.")
-
-
-            raw_starts = self.e_start.get().split(',')
-            for s in raw_starts:
-                if not s.strip().isdigit():
-                    raise ValueError(f"Error in 'Start State(s)':\nExpected integer state IDs, but you entered '{s}'.")
-            self.engine.start_states = set(x.strip() for x in raw_starts if x.strip())
-
-
-            raw_finals = self.e_final.get().split(',')
-            for f in raw_finals:
-                if f.strip() and not f.strip().isdigit():
-                    raise ValueError(f"Error in 'Final State(s)':\nExpected integer state IDs, but you entered '{f}'.")
-            self.engine.final_states = set(x.strip() for x in raw_finals if x.strip())
-
-
-            raw = self.t_trans.get("1.0", tk.END).strip().split('\n')
-            for i, line in enumerate(raw):
-                line = line.strip()
-                if not line: continue
-                parts = line.split(',')
-
-                if len(parts) != 3:
-                    raise ValueError(
-                        f"Error in Line {i + 1}:\nInvalid format '{line}'.\nExpected format: from,symbol,to (e.g., 1,a,2)")
-                u, sym, v = parts[0].strip(), parts[1].strip(), parts[2].strip()
-
-                if not u.isdigit() or not v.isdigit():
-                    raise ValueError(
-                        f"Error in Line {i + 1}:\nState IDs must be integers.\nYou entered: from '{u}' to '{v}'")
-
-                if sym != '#' and sym not in self.engine.alphabet:
-                    raise ValueError(
-                        f"Error in Line {i + 1}:\nSymbol '{sym}' is not in your defined Alphabet: {self.engine.alphabet}")
-
-                self.engine.add_transition(u, sym, v)
-
+            self.node_coords[self.drag_data["item"]] = self.to_world(event)
+            # coalesce motion events: at most one canvas update per frame
+            if not self.drag_pending:
+                self.drag_pending = True
+                self.root.after(16, self.flush_drag)
+
+    def flush_drag(self):
+        self.drag_pending = False
+        n = self.drag_data["item"]
+        if n in self.node_coords:
+            self.grid.move(n, *self.node_coords[n])
+            for u, v in self.incident.get(n, ()):
+                if u in self.node_coords and v in self.node_coords: self.edge_grid.move((u, v), *self.edge_box(u, v))
+        if n in self.node_items: self.move_node(n)
+
+    def on_xscroll(self, *args):
+        self.canvas.xview(*args)
+        self.schedule_render()
+
+    def on_yscroll(self, *args):
+        self.canvas.yview(*args)
+        self.schedule_render()
+
+    def zoom_by(self, factor):
+        x0, y0, x1, y1 = self.visible_region(0)
+        self.zoom = min(4.0, max(0.05, self.zoom * factor))
+        self.update_scrollregion()
+        self.center_on((x0 + x1) / 2, (y0 + y1) / 2)
+        self.schedule_render()
+
+    def schedule_render(self):
+        if not self.render_pending:
+            self.render_pending = True
+            self.root.after_idle(self.render)
+
+    # --- Background work ---
+    def run_task(self, work, on_done, on_error):
+        if self.task is not None: self.task.cancel()
+
+        # callbacks of a superseded task are ignored
+        def done(result):
+            if self.task is not task: return
+            self.task = None
+            self.btn_cancel.config(state=tk.DISABLED)
+            on_done(result)
+
+        def failed(error):
+            if self.task is not task: return
+            self.task = None
+            self.btn_cancel.config(state=tk.DISABLED)
+            if not isinstance(error, Cancelled): on_error(error)
+
+        def progress(fraction, text):
+            if self.task is task: self.on_task_progress(fraction, text)
+
+        task = self.task = BackgroundTask(work, on_done=done, on_error=failed, on_progress=progress)
+        self.btn_cancel.config(state=tk.NORMAL)
+        task.start(self.root)
+
+    def on_task_progress(self, fraction, text):
+        self.lbl_res.config(text=f"{text}... {int(fraction * 100)}%", fg="#333", bg="#fff8e1")
+
+    def cancel_task(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+            self.btn_cancel.config(state=tk.DISABLED)
+            self.lbl_res.config(text="Cancelled", fg="#333", bg="#e0e0e0")
+
+    def load_nfa(self, then=None):
+        # Tk widgets are read here; parsing and compiling run on the worker thread
+        fields = (self.e_alphabet.get(), self.e_states.get(), self.e_start.get(), self.e_final.get(),
+                  self.t_trans.get("1.0", tk.END))
+
+        def work(task):
+            task.progress(0.0, "Parsing")
+            engine = parse_nfa(*fields, progress=task.progress)
+            task.progress(1.0, "Compiling")
+            engine.compile()
+            return engine
+
+        def loaded(engine):
+            self.engine = engine
             self.draw_nfa(True)
             self.lbl_res.config(text="NFA Loaded Successfully", fg="green", bg="#e8f5e9")
-        except Exception as e:
+            if then: then()
+
+        def failed(e):
             messagebox.showerror("Input Error", str(e))
             self.lbl_res.config(text="Error Loading NFA", fg="red", bg="#ffebee")
 
-    def open_trace(self):
-        if self.engine.states_count == 0: self.load_nfa()
-        if self.engine.states_count > 0:
-            inp = self.e_string.get().strip()
+        self.lbl_res.config(text="Loading...", fg="#333", bg="#fff8e1")
+        self.run_task(work, loaded, failed)
 
-            if not inp:
-                messagebox.showerror("Input Error", "Please enter an input string.\nUse '#' for Empty String.")
-                return
-            if inp == '#': inp = ""
+    def open_trace(self, allow_load=True):
+        if self.engine.states_count == 0:
+            if allow_load: self.load_nfa(then=lambda: self.open_trace(False))
+            return
+        inp = self.e_string.get().strip()
+
+        if not inp:
+            messagebox.showerror("Input Error", "Please enter an input string.\nUse '#' for Empty String.")
+            return
+        if inp == '#': inp = ""
 
-            for char in inp:
-                if char not in self.engine.alphabet:
-                    messagebox.showerror("Input Error", f"Invalid character: '{char}'\nNot in Alphabet.")
-                    return
+        for char in inp:
+            if char not in self.engine.alphabet:
+                messagebox.showerror("Input Error", f"Invalid character: '{char}'\nNot in Alphabet.")
+                return
 
-            TraceWindow(self.root, self.engine, inp)
+        TraceWindow(self.root, self.engine, inp, dag=self.dag_var.get())
 
-            self.engine.reset_simulation(self.engine.start_states, inp)
-            curr = self.engine.current_states
-            for char in inp:
-                nxt = set()
-                for s in curr:
-                    if (s, char) in self.engine.transitions: nxt.update(self.engine.transitions[(s, char)])
-                curr = self.engine.get_epsilon_closure(nxt)
+        engine = self.engine
+        engine.reset_simulation(engine.start_states, inp)
 
-            if not curr.isdisjoint(self.engine.final_states):
+        def decided(accepted):
+            if accepted:
                 self.lbl_res.config(text="Result: ACCEPTED", fg="white", bg="#2e7d32")
             else:
                 self.lbl_res.config(text="Result: REJECTED", fg="white", bg="#c62828")
 
+        def failed(e):
+            messagebox.showerror("Simulation Error", str(e))
+
+        self.lbl_res.config(text="Running...", fg="#333", bg="#fff8e1")
+        self.run_task(lambda task: accepts_in_steps(engine, inp, task), decided, failed)
+
     def draw_nfa(self, initial=True):
-        self.canvas.delete("all")
         w, h = self.canvas.winfo_width(), self.canvas.winfo_height()
         if w < 100: w, h = 800, 600
         if initial:
-            cx, cy, r = w // 2, h // 2, min(w, h) // 3
+            self.zoom = 1.0
+            self.force = None
             try:
                 cnt = max(1, self.engine.states_count)
             except:
                 cnt = 1
-            self.node_coords = {}
-            for i in range(1, cnt + 1):
-                ang = (2 * math.pi / cnt) * i - math.pi / 2
-                self.node_coords[str(i)] = (cx + r * math.cos(ang), cy + r * math.sin(ang))
+            states = [str(i) for i in range(1, cnt + 1)]
+            kind = self.layout_var.get()
+            self.layout_key = automaton_key(self.engine, states)
+            cached = cached_layout(kind, self.layout_key)
+            if cached is not None:
+                self.node_coords = dict(cached)
+            elif kind == "Circle":
+                # grow the circle with the state count so nodes keep their spacing; the canvas scrolls
+                r = max(min(w, h) // 3, cnt * 3 * self.node_radius / (2 * math.pi))
+                self.node_coords = circle_layout(states, w // 2, h // 2, r)
+                store_layout(kind, self.layout_key, self.node_coords)
+            else:
+                self.node_coords = layered_layout(self.engine, states)
+                if kind == "Layered":
+                    store_layout(kind, self.layout_key, self.node_coords)
+                else:
+                    # refine the layered start incrementally so the UI keeps responding
+                    self.force = ForceLayout(self.engine, self.node_coords)
+                    self.root.after(15, self.force_tick)
+            self.update_center()
+
+        # labels and start/final markings belong to the previous automaton
+        for e in list(self.edge_items): self.release_edge(e)
+        for n in list(self.node_items): self.release_node(n)
 
         grouped = {}
         for (u, sym), v_list in self.engine.transitions.items():
             for v in v_list:
                 if (u, v) not in grouped: grouped[(u, v)] = []
                 grouped[(u, v)].append(sym)
-
-        for (u, v), syms in grouped.items():
-            lbl = ",".join(sorted(syms))
-            if u in self.node_coords and v in self.node_coords:
-                x1, y1 = self.node_coords[u]
-                x2, y2 = self.node_coords[v]
-                if u == v:
-                    ang = math.atan2(y1 - h // 2, x1 - w // 2)
-                    off = 0.5 if u in self.engine.start_states else 0
-                    fang = ang + off
-                    dist = 60
-                    ctx = x1 + (self.node_radius + dist) * math.cos(fang)
-                    cty = y1 + (self.node_radius + dist) * math.sin(fang)
-                    sx = x1 + self.node_radius * math.cos(fang - 0.5)
-                    sy = y1 + self.node_radius * math.sin(fang - 0.5)
-                    ex = x1 + self.node_radius * math.cos(fang + 0.5)
-                    ey = y1 + self.node_radius * math.sin(fang + 0.5)
-                    self.canvas.create_line(sx, sy, ctx, cty, ex, ey, smooth=True, arrow=tk.LAST,
-                                            arrowshape=self.arrow_style, width=2, fill="#444")
-                    self.canvas.create_text(ctx, cty - 10, text=lbl, fill="blue", font="Arial 10 bold")
-                else:
-                    is_bidirectional = (v, u) in grouped
-                    angle = math.atan2(y2 - y1, x2 - x1)
-                    if is_bidirectional:
-                        mid_x, mid_y = (x1 + x2) / 2, (y1 + y2) / 2
-                        dx, dy = x2 - x1, y2 - y1
-                        dist = math.hypot(dx, dy)
-                        nx, ny = -dy / dist, dx / dist
-                        offset = 40
-                        ctrl_x = mid_x + nx * offset
-                        ctrl_y = mid_y + ny * offset
-                        sx = x1 + self.node_radius * math.cos(angle + 0.2)
-                        sy = y1 + self.node_radius * math.sin(angle + 0.2)
-                        ex = x2 - self.node_radius * math.cos(angle - 0.2)
-                        ey = y2 - self.node_radius * math.sin(angle - 0.2)
-                        self.canvas.create_line(sx, sy, ctrl_x, ctrl_y, ex, ey, arrow=tk.LAST,
-                                                arrowshape=self.arrow_style, smooth=True, fill="#444", width=2)
-                        self.canvas.create_text(ctrl_x, ctrl_y, text=lbl, fill="blue", font="Arial 10 bold")
-                    else:
-                        sx = x1 + self.node_radius * math.cos(angle)
-                        sy = y1 + self.node_radius * math.sin(angle)
-                        ex = x2 - self.node_radius * math.cos(angle)
-                        ey = y2 - self.node_radius * math.sin(angle)
-                        self.canvas.create_line(sx, sy, ex, ey, arrow=tk.LAST, arrowshape=self.arrow_style, fill="#444",
-                                                width=2)
-                        mid_x, mid_y = (sx + ex) / 2, (sy + ey) / 2
-                        nx, ny = -math.sin(angle), math.cos(angle)
-                        tx = mid_x + nx * 15
-                        ty = mid_y + ny * 15
-                        self.canvas.create_text(tx, ty, text=lbl, fill="blue", font="Arial 10 bold")
-
+        self.grouped = grouped
+
+        self.incident = {}
+        for (u, v) in grouped:
+            self.incident.setdefault(u, set()).add((u, v))
+            self.incident.setdefault(v, set()).add((u, v))
+        self.index_layout()
+        if initial and self.node_coords:
+            self.update_scrollregion()
+            first = min(self.engine.start_states & set(self.node_coords), default=next(iter(self.node_coords)))
+            self.center_on(*self.node_coords[first])
+        self.render()
+
+    def center_on(self, x, y):
+        rx0, ry0, rx1, ry1 = self.scroll_bounds
+        w, h = self.canvas.winfo_width(), self.canvas.winfo_height()
+        if w < 100: w, h = 800, 600
+        x, y = self.to_view((x, y))
+        self.canvas.xview_moveto(max(0.0, (x - w / 2 - rx0) / (rx1 - rx0)))
+        self.canvas.yview_moveto(max(0.0, (y - h / 2 - ry0) / (ry1 - ry0)))
+
+    def update_scrollregion(self, pad=120):
+        if not self.node_coords: return
+        xs = [x for x, _ in self.node_coords.values()]
+        ys = [y for _, y in self.node_coords.values()]
+        self.scroll_bounds = tuple(self.to_view((min(xs) - pad, min(ys) - pad, max(xs) + pad, max(ys) + pad)))
+        self.canvas.config(scrollregion=self.scroll_bounds)
+
+    def update_center(self):
+        if not self.node_coords: return
+        xs = [x for x, _ in self.node_coords.values()]
+        ys = [y for _, y in self.node_coords.values()]
+        self.layout_center = ((min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2)
+
+    def force_tick(self):
+        force = self.force
+        if force is None: return
+        # bounded by time rather than iterations, so a tick stays short however many states there are
+        iteration = force.iteration
+        done = force.run_for(0.01)
+        if force.iteration == iteration:
+            self.root.after(15, self.force_tick)
+            return
+        self.node_coords = force.positions()
+        self.update_center()
+        self.index_layout()
+        self.schedule_render()
+        if done:
+            self.force = None
+            store_layout("Force-directed", self.layout_key, self.node_coords)
+        else:
+            self.root.after(15, self.force_tick)
+
+    def index_layout(self):
+        self.grid = SpatialGrid()
         for n, (x, y) in self.node_coords.items():
-            w_line = 3 if n in self.engine.final_states else 1
-            self.canvas.create_oval(x - 25, y - 25, x + 25, y + 25, fill="white", outline="black", width=w_line)
-            if n in self.engine.final_states:
-                self.canvas.create_oval(x - 20, y - 20, x + 20, y + 20, fill=None, outline="black", width=1)
-            self.canvas.create_text(x, y, text=n, font="Arial 12 bold")
-            if n in self.engine.start_states:
-                ang = math.atan2(y - h // 2, x - w // 2)
-                sx = x + 80 * math.cos(ang)
-                sy = y + 80 * math.sin(ang)
-                ex = x + 25 * math.cos(ang)
-                ey = y + 25 * math.sin(ang)
-                self.canvas.create_line(sx, sy, ex, ey, arrow=tk.LAST, arrowshape=self.arrow_style, width=3,
-                                        fill="black")
-                self.canvas.create_text(sx, sy - 10, text="Start", font="Arial 11 bold")
-
+            self.grid.insert(n, x, y)
+        self.edge_grid = BoxGrid()
+        for (u, v) in self.grouped:
+            if u in self.node_coords and v in self.node_coords: self.edge_grid.insert((u, v), *self.edge_box(u, v))
+
+    def edge_box(self, u, v):
+        # the endpoints' extent; loops, curves and labels stay within the margin of visible_region
+        (ux, uy), (vx, vy) = self.node_coords[u], self.node_coords[v]
+        return min(ux, vx), min(uy, vy), max(ux, vx), max(uy, vy)
+
+    def visible_region(self, margin=150):
+        z = self.zoom
+        x0, y0 = self.canvas.canvasx(0), self.canvas.canvasy(0)
+        w, h = self.canvas.winfo_width(), self.canvas.winfo_height()
+        if w < 100: w, h = 800, 600
+        x1, y1 = x0 + w, y0 + h
+        return x0 / z - margin, y0 / z - margin, x1 / z + margin, y1 / z + margin
+
+    def render(self):
+        # only nodes and edges inside the visible region have canvas items; those that scroll out of view are
+        # hidden and reused rather than deleted, as in TraceWindow.render
+        self.render_pending = False
+        self.update_scrollregion()
+
+        x0, y0, x1, y1 = self.visible_region()
+        edges = self.edge_grid.query(x0, y0, x1, y1)
+        nodes = set(self.grid.query(x0, y0, x1, y1))
+        for e in [e for e in self.edge_items if e not in edges]: self.release_edge(e)
+        for n in [n for n in self.node_items if n not in nodes]: self.release_node(n)
+
+        for (u, v) in edges:
+            if (u, v) in self.edge_items: self.place_edge(u, v)
+            else: self.draw_edge(u, v)
+        for n in nodes:
+            if n in self.node_items: self.place_node(n)
+            else: self.draw_node(n)
+        # pooled items keep their old stacking: edges go below outer rings, then inner rings, then labels
+        self.canvas.tag_raise('node')
+        self.canvas.tag_raise('ring')
+        self.canvas.tag_raise('label')
+
+    def acquire(self, kind, coords, layer, **opts):
+        free = self.free[kind]
+        item = free.pop() if free else getattr(self.canvas, 'create_' + kind)(*coords)
+        self.canvas.coords(item, *coords)
+        self.canvas.itemconfig(item, state=tk.NORMAL, tags=layer, **opts)
+        return item
+
+    def release(self, kind, item):
+        self.canvas.itemconfig(item, state=tk.HIDDEN)
+        self.free[kind].append(item)
+
+    def draw_edge(self, u, v):
+        pts, label = self.edge_geometry(u, v)
+        line = self.acquire('line', self.to_view(pts), 'edge', smooth=len(pts) > 4, arrow=tk.LAST,
+                            arrowshape=self.arrow_style, width=2, fill="#444")
+        text = self.acquire('text', self.to_view(label), 'edge', text=",".join(sorted(self.grouped[(u, v)])),
+                            fill="blue", font="Arial 10 bold")
+        self.canvas.tag_lower(line)
+        self.canvas.tag_lower(text)
+        self.edge_items[(u, v)] = (line, text)
+
+    def place_edge(self, u, v):
+        line, text = self.edge_items[(u, v)]
+        pts, label_pos = self.edge_geometry(u, v)
+        self.canvas.coords(line, *self.to_view(pts))
+        self.canvas.coords(text, *self.to_view(label_pos))
+
+    def release_edge(self, e):
+        line, text = self.edge_items.pop(e)
+        self.release('line', line)
+        self.release('text', text)
+
+    def draw_node(self, n):
+        x, y = self.node_coords[n]
+        w_line = 3 if n in self.engine.final_states else 1
+        outer = self.acquire('oval', self.to_view((x - 25, y - 25, x + 25, y + 25)), 'node', fill="white",
+                             outline="black", width=w_line)
+        inner = None
+        if n in self.engine.final_states:
+            inner = self.acquire('oval', self.to_view((x - 20, y - 20, x + 20, y + 20)), 'ring', fill="",
+                                 outline="black", width=1)
+        label = self.acquire('text', self.to_view((x, y)), 'label', text=n, fill="black", font="Arial 12 bold")
+        start = None
+        if n in self.engine.start_states:
+            pts, label_pos = self.start_geometry(n)
+            start = (self.acquire('line', self.to_view(pts), 'label', smooth=False, arrow=tk.LAST,
+                                  arrowshape=self.arrow_style, width=3, fill="black"),
+                     self.acquire('text', self.to_view(label_pos), 'label', text="Start", fill="black",
+                                  font="Arial 11 bold"))
+        self.node_items[n] = (outer, inner, label, start)
+
+    def place_node(self, n):
+        x, y = self.node_coords[n]
+        outer, inner, label, start = self.node_items[n]
+        self.canvas.coords(outer, *self.to_view((x - 25, y - 25, x + 25, y + 25)))
+        if inner: self.canvas.coords(inner, *self.to_view((x - 20, y - 20, x + 20, y + 20)))
+        self.canvas.coords(label, *self.to_view((x, y)))
+        if start:
+            pts, label_pos = self.start_geometry(n)
+            self.canvas.coords(start[0], *self.to_view(pts))
+            self.canvas.coords(start[1], *self.to_view(label_pos))
+
+    def release_node(self, n):
+        outer, inner, label, start = self.node_items.pop(n)
+        self.release('oval', outer)
+        if inner: self.release('oval', inner)
+        self.release('text', label)
+        if start:
+            self.release('line', start[0])
+            self.release('text', start[1])
+
+    def edge_geometry(self, u, v):
+        cx, cy = self.layout_center
+        x1, y1 = self.node_coords[u]
+        x2, y2 = self.node_coords[v]
+        if u == v:
+            ang = math.atan2(y1 - cy, x1 - cx)
+            off = 0.5 if u in self.engine.start_states else 0
+            fang = ang + off
+            dist = 60
+            ctx = x1 + (self.node_radius + dist) * math.cos(fang)
+            cty = y1 + (self.node_radius + dist) * math.sin(fang)
+            sx = x1 + self.node_radius * math.cos(fang - 0.5)
+            sy = y1 + self.node_radius * math.sin(fang - 0.5)
+            ex = x1 + self.node_radius * math.cos(fang + 0.5)
+            ey = y1 + self.node_radius * math.sin(fang + 0.5)
+            return (sx, sy, ctx, cty, ex, ey), (ctx, cty - 10)
+
+        angle = math.atan2(y2 - y1, x2 - x1)
+        if (v, u) in self.grouped:
+            mid_x, mid_y = (x1 + x2) / 2, (y1 + y2) / 2
+            dx, dy = x2 - x1, y2 - y1
+            dist = math.hypot(dx, dy) or 1
+            nx, ny = -dy / dist, dx / dist
+            offset = 40
+            ctrl_x = mid_x + nx * offset
+            ctrl_y = mid_y + ny * offset
+            sx = x1 + self.node_radius * math.cos(angle + 0.2)
+            sy = y1 + self.node_radius * math.sin(angle + 0.2)
+            ex = x2 - self.node_radius * math.cos(angle - 0.2)
+            ey = y2 - self.node_radius * math.sin(angle - 0.2)
+            return (sx, sy, ctrl_x, ctrl_y, ex, ey), (ctrl_x, ctrl_y)
+
+        sx = x1 + self.node_radius * math.cos(angle)
+        sy = y1 + self.node_radius * math.sin(angle)
+        ex = x2 - self.node_radius * math.cos(angle)
+        ey = y2 - self.node_radius * math.sin(angle)
+        mid_x, mid_y = (sx + ex) / 2, (sy + ey) / 2
+        nx, ny = -math.sin(angle), math.cos(angle)
+        return (sx, sy, ex, ey), (mid_x + nx * 15, mid_y + ny * 15)
+
+    def start_geometry(self, n):
+        cx, cy = self.layout_center
+        x, y = self.node_coords[n]
+        ang = math.atan2(y - cy, x - cx)
+        sx = x + 80 * math.cos(ang)
+        sy = y + 80 * math.sin(ang)
+        ex = x + 25 * math.cos(ang)
+        ey = y + 25 * math.sin(ang)
+        return (sx, sy, ex, ey), (sx, sy - 10)
+
+    def move_node(self, n):
+        self.place_node(n)
+        for u, v in self.incident.get(n, ()):
+            if u not in self.node_coords or v not in self.node_coords: continue
+            if (u, v) in self.edge_items: self.place_edge(u, v)
+            else: self.draw_edge(u, v)
 
 if __name__ == "__main__":
     root = tk.Tk()
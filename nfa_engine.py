@@ -0,0 +1,961 @@
+import codecs
+import cProfile
+import mmap
+import pstats
+import tracemalloc
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+def iter_bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def strongly_connected(graph):
+    # iterative Tarjan; components come out sinks first (reverse topological order)
+    index, low, on_stack, stack, comps = {}, {}, set(), [], []
+    counter = 0
+    for root in graph:
+        if root in index: continue
+        work = [(root, iter(graph.get(root, ())))]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            u, it = work[-1]
+            pushed = False
+            for v in it:
+                if v not in index:
+                    index[v] = low[v] = counter
+                    counter += 1
+                    stack.append(v)
+                    on_stack.add(v)
+                    work.append((v, iter(graph.get(v, ()))))
+                    pushed = True
+                    break
+                if v in on_stack: low[u] = min(low[u], index[v])
+            if pushed: continue
+            work.pop()
+            if work: low[work[-1][0]] = min(low[work[-1][0]], low[u])
+            if low[u] == index[u]:
+                comp = []
+                while True:
+                    w = stack.pop()
+                    on_stack.discard(w)
+                    comp.append(w)
+                    if w == u: break
+                comps.append(comp)
+    return comps
+
+
+class MaskRows(dict):
+    # state index -> mask, read from CSR arrays (e.g. a memory-mapped file) the first time a state is looked
+    # up; afterwards indexing is a plain dict hit. Compiled rows are only ever indexed, never iterated, so a
+    # list of masks and a MaskRows are interchangeable.
+    def __init__(self, indptr, indices, count, base=0):
+        super().__init__()
+        self.indptr = indptr
+        self.indices = indices
+        self.count = count
+        self.base = base
+
+    def __missing__(self, i):
+        if not 0 <= i < self.count: raise IndexError(i)
+        lo, hi = self.indptr[self.base + i], self.indptr[self.base + i + 1]
+        mask = 0
+        for j in self.indices[lo:hi]:
+            mask |= 1 << j
+        self[i] = mask
+        return mask
+
+    def __reduce__(self):
+        # memoryviews cannot be pickled: send this row's slice of the arrays as plain arrays, plus the masks
+        # already built, so a worker process stays lazy too
+        lo, hi = self.indptr[self.base], self.indptr[self.base + self.count]
+        indptr = array('I', [x - lo for x in self.indptr[self.base:self.base + self.count + 1]])
+        return MaskRows, (indptr, array('I', self.indices[lo:hi]), self.count), None, None, iter(self.items())
+
+
+class CompiledNFA:
+    def __init__(self, engine):
+        states = set(str(i) for i in range(1, engine.states_count + 1))
+        states.update(engine.start_states, engine.final_states)
+        for (u, sym), targets in engine.transitions.items():
+            states.add(u)
+            states.update(targets)
+        self.states = sorted(states, key=lambda x: (len(x), x))
+        self.state_index = {s: i for i, s in enumerate(self.states)}
+        self.symbols = sorted(set(sym for (_, sym) in engine.transitions if sym != '#'))
+        self.symbol_index = {c: i for i, c in enumerate(self.symbols)}
+        self.start_snapshot = frozenset(engine.start_states)
+        self.final_snapshot = frozenset(engine.final_states)
+
+        n = len(self.states)
+        table = engine.closure_table
+        if table is None: table = engine.build_closure_table()
+        # members of one epsilon cycle share a closure object, so build each mask once
+        shared = {}
+        self.closure = []
+        for s in self.states:
+            closure = table.get(s)
+            if closure is None:
+                self.closure.append(1 << self.state_index[s])
+                continue
+            mask = shared.get(id(closure))
+            if mask is None: mask = shared[id(closure)] = self.mask_of(closure)
+            self.closure.append(mask)
+        # successors under each symbol, already epsilon-closed
+        self.succ = [[0] * n for _ in self.symbols]
+        for (u, sym), targets in engine.transitions.items():
+            if sym == '#': continue
+            row = self.succ[self.symbol_index[sym]]
+            i = self.state_index[u]
+            for v in targets:
+                row[i] |= self.closure[self.state_index[v]]
+        self.start_mask = self.close(self.mask_of(engine.start_states))
+        self.final_mask = self.mask_of(engine.final_states)
+
+    def mask_of(self, states):
+        mask = 0
+        for s in states:
+            mask |= 1 << self.state_index[s]
+        return mask
+
+    def states_of(self, mask):
+        return set(self.states[i] for i in iter_bits(mask))
+
+    def close(self, mask):
+        out = 0
+        for i in iter_bits(mask):
+            out |= self.closure[i]
+        return out
+
+    def step(self, mask, char):
+        c = self.symbol_index.get(char)
+        if c is None: return 0
+        row = self.succ[c]
+        nxt = 0
+        for i in iter_bits(mask):
+            nxt |= row[i]
+        return nxt
+
+    def edge_lists(self):
+        # per symbol: [(state, [closed successor states])] for every non-empty row
+        n = len(self.states)
+        return [[(i, list(iter_bits(row[i]))) for i in range(n) if row[i]] for row in self.succ]
+
+    def run_batch(self, words):
+        # bit-parallel over the batch: active[s] holds one bit per word currently in state s
+        n = len(self.states)
+        active = [0] * n
+        everyone = (1 << len(words)) - 1
+        for i in iter_bits(self.start_mask):
+            active[i] = everyone
+        edges = self.edge_lists()
+        # words bucketed by length: ended_at[t] has the bit of every word of length t
+        ended_at = {}
+        for j, w in enumerate(words):
+            ended_at[len(w)] = ended_at.get(len(w), 0) | 1 << j
+        longest = max(ended_at, default=0)
+        ended = 0
+        for t in range(longest):
+            ended |= ended_at.get(t, 0)
+            # column t of the batch, word 0 in the lowest bit; ended words are padded and masked out
+            col = ''.join([w[t] if t < len(w) else '\0' for w in reversed(words)])
+            present = set(col)
+            flags = {ord(x): '0' for x in present}
+            nxt = [a & ended for a in active] if ended else [0] * n
+            for char in present:
+                c = self.symbol_index.get(char)
+                if c is None or not any(active[u] for u, _ in edges[c]): continue
+                flags[ord(char)] = '1'
+                on = int(col.translate(flags), 2) & ~ended
+                flags[ord(char)] = '0'
+                for u, targets in edges[c]:
+                    x = active[u] & on
+                    if not x: continue
+                    for v in targets:
+                        nxt[v] |= x
+            active = nxt
+        accepted = 0
+        for i in iter_bits(self.final_mask):
+            accepted |= active[i]
+        return [bool(accepted >> j & 1) for j in range(len(words))]
+
+    def run(self, word):
+        mask = self.start_mask
+        for char in word:
+            if not mask: break
+            mask = self.step(mask, char)
+        return mask
+
+    def scan(self, text, pattern_masks, mode='longest'):
+        # yields (pattern id, start, end)
+        if mode == 'all': return self.scan_all(text, pattern_masks)
+        if mode == 'longest': return self.scan_longest(text, pattern_masks)
+        raise ValueError(f"Unknown search mode '{mode}'")
+
+    def scan_all(self, text, pattern_masks):
+        # threads are (start offset, state mask) in increasing start order with disjoint masks, so each
+        # state remembers only its leftmost start; the start closure is re-injected at every offset.
+        # At every end offset each pattern reports its leftmost match, in pattern id order.
+        threads = []
+        i = 0
+        while True:
+            claimed = 0
+            for _, mask in threads:
+                claimed |= mask
+            fresh = self.start_mask & ~claimed
+            if fresh: threads.append((i, fresh))
+
+            for pid, fm in enumerate(pattern_masks):
+                for start, mask in threads:
+                    if mask & fm:
+                        yield pid, start, i
+                        break
+            if i == len(text): return
+
+            char = text[i]
+            i += 1
+            nxt, claimed = [], 0
+            for start, mask in threads:
+                m = self.step(mask, char) & ~claimed
+                if m:
+                    nxt.append((start, m))
+                    claimed |= m
+            threads = nxt
+
+    def live_masks(self, text, final):
+        # backward pass: live[i] holds the states from which some text[i:j] reaches a final state.
+        # Each distinct mask is stored once and transitions between them are cached, like a lazy reverse DFA;
+        # live keeps one id per offset, one byte wide until there are more than 256 distinct masks.
+        n = len(self.states)
+        edges = [[(i, row[i]) for i in range(n) if row[i]] for row in self.succ]
+        masks = [final]
+        ids = {final: 0}
+        cache = {}
+        live = array('B', bytes(len(text) + 1))
+        cur = 0
+        for i in range(len(text) - 1, -1, -1):
+            c = self.symbol_index.get(text[i])
+            key = (cur, c)
+            nxt = cache.get(key)
+            if nxt is None:
+                target = masks[cur]
+                mask = final
+                if c is not None:
+                    for u, m in edges[c]:
+                        if m & target: mask |= 1 << u
+                nxt = ids.get(mask)
+                if nxt is None:
+                    nxt = ids[mask] = len(masks)
+                    masks.append(mask)
+                    if nxt == 256: live = array('H', live)
+                    elif nxt == 65536: live = array('I', live)
+                cache[key] = nxt
+            live[i] = cur = nxt
+        return masks, live
+
+    def scan_longest(self, text, pattern_masks):
+        # non-overlapping leftmost-longest in linear time: with the live masks known, a match starts at i
+        # exactly when the start closure is live there, and its thread is followed only while it stays live.
+        # This reads the text twice, backwards first, so it needs the whole text in memory; scan_stream
+        # handles text that arrives in chunks.
+        final = 0
+        for fm in pattern_masks:
+            final |= fm
+        masks, live = self.live_masks(text, final)
+        n = len(text)
+        i = 0
+        no_empty_at = -1
+        while i <= n:
+            mask = self.start_mask & masks[live[i]]
+            if i == no_empty_at:
+                # no empty match right where the previous match ended
+                mask = self.step(mask, text[i]) & masks[live[i + 1]] if mask and i < n else 0
+                j = i + 1
+            else:
+                j = i
+            if not mask:
+                i += 1
+                continue
+            best = None
+            while True:
+                if mask & final:
+                    best = (next(pid for pid, fm in enumerate(pattern_masks) if mask & fm), i, j)
+                if j == n: break
+                mask = self.step(mask, text[j]) & masks[live[j + 1]]
+                if not mask: break
+                j += 1
+            yield best
+            i = no_empty_at = best[2]
+
+    def scan_stream(self, chunks, pattern_masks, lookahead=1024):
+        # leftmost-longest over an iterable of text chunks in one forward pass, keeping only the text since
+        # the pending match ended. A match is settled once no earlier-or-equal start can still extend it, or
+        # once the scan has read `lookahead` characters past its end; in that second case a longer match
+        # finishing further on is missed. Threads that started inside the settled match are dropped and the
+        # text after it is read again, at most `lookahead` characters per match, so the scan stays linear.
+        chunks = iter(chunks)
+        buf, base = '', 0  # buf[k] is the character at offset base + k
+        eof = False
+        i = 0
+        threads = []
+        best = None
+        no_empty_at = -1
+        while True:
+            if best is None:
+                claimed = 0
+                for _, mask in threads:
+                    claimed |= mask
+                fresh = self.start_mask & ~claimed
+                if fresh: threads.append((i, fresh))
+
+            for start, mask in threads:
+                hit = [pid for pid, fm in enumerate(pattern_masks) if mask & fm]
+                if not hit: continue
+                if start == i == no_empty_at: continue
+                if best is None or start < best[1] or (start == best[1] and i > best[2]): best = (hit[0], start, i)
+                break
+
+            while i - base == len(buf) and not eof:
+                # only a pending match can send the scan back, so without one the read text is dropped
+                if best is None: buf, base = '', i
+                chunk = next(chunks, None)
+                if chunk is None: eof = True
+                else: buf += chunk
+            at_end = eof and i - base == len(buf)
+
+            if best is not None:
+                threads = [(st, m) for st, m in threads if st <= best[1]]
+                if not threads or at_end or i - best[2] >= lookahead:
+                    yield best
+                    i, threads = best[2], []
+                    no_empty_at = i
+                    best = None
+                    buf, base = buf[i - base:], i
+                    continue
+            if at_end: return
+
+            char = buf[i - base]
+            i += 1
+            nxt, claimed = [], 0
+            for start, mask in threads:
+                m = self.step(mask, char) & ~claimed
+                if m:
+                    nxt.append((start, m))
+                    claimed |= m
+            threads = nxt
+
+
+class LazyDFA:
+    # subset construction on demand: (state mask, symbol) -> next mask, LRU-bounded
+    def __init__(self, compiled, max_size=4096):
+        self.compiled = compiled
+        self.max_size = max_size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def step(self, mask, char):
+        key = (mask, char)
+        cache = self.cache
+        nxt = cache.get(key)
+        if nxt is not None:
+            self.hits += 1
+            cache.move_to_end(key)
+            return nxt
+        self.misses += 1
+        nxt = self.compiled.step(mask, char)
+        cache[key] = nxt
+        if len(cache) > self.max_size: cache.popitem(last=False)
+        return nxt
+
+    def run(self, word):
+        mask = self.compiled.start_mask
+        for char in word:
+            if not mask: break
+            mask = self.step(mask, char)
+        return mask
+
+
+class DFA:
+    # table-driven DFA: next state is table[state * len(symbols) + symbol]
+    def __init__(self, symbols, table, accepting, start):
+        self.symbols = symbols
+        self.symbol_index = {c: i for i, c in enumerate(symbols)}
+        self.table = table
+        self.accepting = accepting
+        self.start = start
+        self.states_count = len(accepting)
+
+    @classmethod
+    def from_compiled(cls, compiled, max_states=None):
+        symbols = list(compiled.symbols)
+        ids = {compiled.start_mask: 0}
+        masks = [compiled.start_mask]
+        table = []
+        i = 0
+        while i < len(masks):
+            mask = masks[i]
+            i += 1
+            for c in symbols:
+                nxt = compiled.step(mask, c)
+                if nxt not in ids:
+                    if max_states is not None and len(masks) >= max_states:
+                        raise ValueError(f"Subset construction exceeded the limit of {max_states} DFA states.")
+                    ids[nxt] = len(masks)
+                    masks.append(nxt)
+                table.append(ids[nxt])
+        accepting = [bool(m & compiled.final_mask) for m in masks]
+        return cls(symbols, table, accepting, 0)
+
+    def accepts(self, word):
+        table, index, k = self.table, self.symbol_index, len(self.symbols)
+        state = self.start
+        for char in word:
+            c = index.get(char)
+            if c is None: return False
+            state = table[state * k + c]
+        return self.accepting[state]
+
+    def minimize(self):
+        # Hopcroft partition refinement
+        n, k, table = self.states_count, len(self.symbols), self.table
+        inverse = [[[] for _ in range(n)] for _ in range(k)]
+        for q in range(n):
+            for c in range(k):
+                inverse[c][table[q * k + c]].append(q)
+
+        finals = set(q for q in range(n) if self.accepting[q])
+        others = set(range(n)) - finals
+        blocks = [b for b in (finals, others) if b]
+        block_of = [0] * n
+        for b, members in enumerate(blocks):
+            for q in members:
+                block_of[q] = b
+        work = set(range(len(blocks)))
+
+        while work:
+            splitter = list(blocks[work.pop()])
+            for c in range(k):
+                inv = inverse[c]
+                touched = {}
+                for t in splitter:
+                    for q in inv[t]:
+                        touched.setdefault(block_of[q], set()).add(q)
+                for b, hit in touched.items():
+                    members = blocks[b]
+                    if len(hit) == len(members): continue
+                    members -= hit
+                    new_b = len(blocks)
+                    blocks.append(hit)
+                    for q in hit:
+                        block_of[q] = new_b
+                    if b in work or len(hit) <= len(members):
+                        work.add(new_b)
+                    else:
+                        work.add(b)
+
+        new_table = [0] * (len(blocks) * k)
+        accepting = [False] * len(blocks)
+        for b, members in enumerate(blocks):
+            q = next(iter(members))
+            accepting[b] = self.accepting[q]
+            for c in range(k):
+                new_table[b * k + c] = block_of[table[q * k + c]]
+        return DFA(self.symbols, new_table, accepting, block_of[self.start])
+
+
+class StreamMatcher:
+    # keeps only the current state mask, so input can be fed in chunks of any size; bytes are decoded
+    # incrementally, so a multi-byte character may be split across chunks
+    def __init__(self, stepper, start_mask, final_mask, scan=False, encoding='utf-8'):
+        self.stepper = stepper
+        self.start_mask = start_mask
+        self.final_mask = final_mask
+        self.scan = scan
+        self.encoding = encoding
+        self.reset()
+
+    def reset(self):
+        self.mask = self.start_mask
+        self.position = 0
+        self.pending = [0] if self.scan and self.mask & self.final_mask else []
+        self.decoder = codecs.getincrementaldecoder(self.encoding)()
+
+    def feed(self, chunk):
+        if isinstance(chunk, (bytes, bytearray, memoryview, mmap.mmap)): chunk = self.decoder.decode(chunk)
+        step, mask, final = self.stepper.step, self.mask, self.final_mask
+        offsets, self.pending = self.pending, []
+        if not self.scan:
+            for char in chunk:
+                if not mask: break
+                mask = step(mask, char)
+        else:
+            pos = self.position
+            for char in chunk:
+                pos += 1
+                if not mask: break
+                mask = step(mask, char)
+                if mask & final: offsets.append(pos)
+        self.mask = mask
+        self.position += len(chunk)
+        return offsets if self.scan else None
+
+    def feed_file(self, f, chunk_size=1 << 20):
+        # works for text/binary file objects and mmap objects alike
+        offsets = []
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk: break
+            found = self.feed(chunk)
+            if found: offsets.extend(found)
+        # a match at offset 0 is still pending when the file was empty
+        offsets.extend(self.pending)
+        self.pending = []
+        return offsets if self.scan else None
+
+    def is_accepting(self):
+        return bool(self.mask & self.final_mask)
+
+    def finish(self):
+        # flushes the decoder (an incomplete trailing character raises UnicodeDecodeError) and resets;
+        # returns whether the input was accepted, or in scan mode the match offsets not yet returned
+        offsets = self.feed(self.decoder.decode(b'', final=True))
+        accepted = self.is_accepting()
+        self.reset()
+        return offsets if self.scan else accepted
+
+
+class RunStats:
+    def __init__(self):
+        self.runs = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.steps = 0
+        self.max_active = 0
+        self.total_active = 0
+        # closed successor rows merged, i.e. per-state epsilon-closure lookups
+        self.closure_expansions = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def mean_active(self):
+        return self.total_active / self.steps if self.steps else 0.0
+
+    def as_dict(self):
+        d = dict(vars(self))
+        d['mean_active'] = self.mean_active
+        return d
+
+
+class ProfileReport:
+    def __init__(self):
+        self.stats = None
+        self.cpu = None
+        self.peak_memory = None
+        self.snapshot = None
+
+    def print_cpu(self, limit=20, sort='cumulative'):
+        if self.cpu: self.cpu.sort_stats(sort).print_stats(limit)
+
+
+class NFAEngine:
+    def __init__(self):
+        self.alphabet = set()
+        # tables deferred with defer() until first use (see nfa_io.load_binary): name -> zero-argument builder
+        self.loaders = {}
+        self.transitions = {}
+        self.start_states = set()
+        self.final_states = set()
+        self.states_count = 0
+        self.compiled = None
+        self.closure_table = None
+        self.mode = 'nfa'
+        self.dfa_cache_size = 4096
+        self.lazy_dfa = None
+        # instrumentation: off unless stats are enabled or a hook is registered
+        self.stats = None
+        self.hooks = {'step': [], 'accept': [], 'reject': []}
+        self.instrumented = False
+
+    def copy(self):
+        # independent engine with the same automaton and settings; stats and hooks start empty.
+        # The compiled tables are never modified in place, so they are shared until either side changes.
+        engine = NFAEngine()
+        engine.alphabet = set(self.alphabet)
+        engine.transitions = {key: set(targets) for key, targets in self.transitions.items()}
+        engine.start_states = set(self.start_states)
+        engine.final_states = set(self.final_states)
+        engine.states_count = self.states_count
+        engine.compiled = self.compiled
+        engine.mode = self.mode
+        engine.dfa_cache_size = self.dfa_cache_size
+        return engine
+
+    def defer(self, name, loader):
+        # 'transitions' or 'closure_table' is built by loader() the first time it is read
+        if name not in ('transitions', 'closure_table'): raise ValueError(f"'{name}' cannot be deferred")
+        self.__dict__.pop(name, None)
+        self.loaders[name] = loader
+
+    def __getattr__(self, name):
+        # only reached for attributes that are not set, which includes deferred tables
+        loaders = self.__dict__.get('loaders')
+        if not loaders or name not in loaders: raise AttributeError(name)
+        value = loaders.pop(name)()
+        setattr(self, name, value)
+        return value
+
+    def __getstate__(self):
+        for name in list(self.loaders):
+            getattr(self, name)
+        return self.__dict__
+
+    def add_transition(self, u, sym, v):
+        self.compiled = None
+        key = (u, sym)
+        if key not in self.transitions:
+            self.transitions[key] = set()
+        self.transitions[key].add(v)
+        if sym == '#' and self.closure_table is not None: self.extend_closures(u, v)
+
+    def build_closure_table(self):
+        graph = {}
+        for (u, sym), targets in self.transitions.items():
+            if sym == '#': graph[u] = targets
+        table = {}
+        # SCCs arrive sinks first, so every successor component is already closed
+        for comp in strongly_connected(graph):
+            closure = set(comp)
+            for u in comp:
+                for v in graph.get(u, ()):
+                    if v not in closure: closure |= table[v]
+            closure = frozenset(closure)
+            for u in comp:
+                table[u] = closure
+        self.closure_table = table
+        return table
+
+    def extend_closures(self, u, v):
+        table = self.closure_table
+        added = table.get(v, frozenset((v,)))
+        if v in table.get(u, (u,)): return
+        if u not in table: table[u] = frozenset((u,))
+        for s, closure in table.items():
+            if u in closure: table[s] = closure | added
+
+    def get_epsilon_closure(self, states):
+        table = self.closure_table
+        if table is None: table = self.build_closure_table()
+        closure = set(states)
+        for s in states:
+            if s in table: closure |= table[s]
+        return closure
+
+    def reset_simulation(self, start_nodes, input_str):
+        self.start_states = start_nodes
+        self.input_string = input_str
+        self.current_states = self.get_epsilon_closure(self.start_states)
+
+    def compile(self):
+        c = self.compiled
+        if c is None or c.start_snapshot != self.start_states or c.final_snapshot != self.final_states:
+            c = self.compiled = CompiledNFA(self)
+        return c
+
+    def get_lazy_dfa(self):
+        c = self.compile()
+        d = self.lazy_dfa
+        if d is None or d.compiled is not c or d.max_size != self.dfa_cache_size:
+            d = self.lazy_dfa = LazyDFA(c, self.dfa_cache_size)
+        return d
+
+    def run_mask(self, word):
+        if self.instrumented: return self.run_instrumented(word)
+        if self.mode == 'lazy_dfa': return self.get_lazy_dfa().run(word)
+        if self.mode != 'nfa': raise ValueError(f"Unknown simulation mode '{self.mode}'")
+        return self.compile().run(word)
+
+    # --- Instrumentation ---
+    # stats and hooks cover accepts(), run() and accepts_many(); stream() and finditer() are not counted
+    def enable_instrumentation(self):
+        if self.stats is None: self.stats = RunStats()
+        self.instrumented = True
+        return self.stats
+
+    def disable_instrumentation(self):
+        self.stats = None
+        self.instrumented = any(self.hooks.values())
+
+    def add_hook(self, event, fn):
+        # 'step' hooks get (position, char, state mask); 'accept' / 'reject' hooks get the word
+        self.hooks[event].append(fn)
+        self.instrumented = True
+
+    def remove_hook(self, event, fn):
+        self.hooks[event].remove(fn)
+        self.instrumented = self.stats is not None or any(self.hooks.values())
+
+    def run_instrumented(self, word):
+        lazy = self.mode == 'lazy_dfa'
+        if not lazy and self.mode != 'nfa': raise ValueError(f"Unknown simulation mode '{self.mode}'")
+        stepper = self.get_lazy_dfa() if lazy else self.compile()
+        stats, step_hooks = self.stats, self.hooks['step']
+        hits, misses = (stepper.hits, stepper.misses) if lazy else (0, 0)
+        mask = self.compiled.start_mask
+        for pos, char in enumerate(word):
+            if not mask: break
+            if stats:
+                # a lazy DFA cache hit merges no closure rows; only real subset steps count
+                missed = stepper.misses if lazy else None
+                expanded = bin(mask).count('1')
+            mask = stepper.step(mask, char)
+            if stats:
+                if not lazy or stepper.misses != missed: stats.closure_expansions += expanded
+                active = bin(mask).count('1')
+                stats.steps += 1
+                stats.total_active += active
+                if active > stats.max_active: stats.max_active = active
+            for fn in step_hooks:
+                fn(pos, char, mask)
+        if stats:
+            stats.runs += 1
+            if lazy:
+                stats.cache_hits += stepper.hits - hits
+                stats.cache_misses += stepper.misses - misses
+        return mask
+
+    @contextmanager
+    def profile(self, cpu=True, memory=True):
+        report = ProfileReport()
+        previous = self.stats
+        report.stats = self.stats = RunStats()
+        self.instrumented = True
+        profiler = cProfile.Profile() if cpu else None
+        started_tracing = memory and not tracemalloc.is_tracing()
+        if started_tracing: tracemalloc.start()
+        if profiler: profiler.enable()
+        try:
+            yield report
+        finally:
+            if profiler:
+                profiler.disable()
+                report.cpu = pstats.Stats(profiler)
+            if memory:
+                report.peak_memory = tracemalloc.get_traced_memory()[1]
+                report.snapshot = tracemalloc.take_snapshot()
+                if started_tracing: tracemalloc.stop()
+            self.stats = previous
+            self.instrumented = previous is not None or any(self.hooks.values())
+
+    # --- Reduction ---
+    def all_states(self):
+        states = set(str(i) for i in range(1, self.states_count + 1))
+        states.update(self.start_states, self.final_states)
+        for (u, sym), targets in self.transitions.items():
+            states.add(u)
+            states.update(targets)
+        return states
+
+    def transition_count(self):
+        return sum(len(targets) for targets in self.transitions.values())
+
+    def remove_epsilon(self):
+        # a state inherits the moves and finality of everything in its epsilon closure
+        closures = {s: self.get_epsilon_closure((s,)) for s in self.all_states()}
+        moves = {}
+        for (u, sym), targets in self.transitions.items():
+            if sym != '#': moves.setdefault(u, []).append((sym, targets))
+        transitions = {}
+        for s, closure in closures.items():
+            for p in closure:
+                for sym, targets in moves.get(p, ()):
+                    key = (s, sym)
+                    if key not in transitions: transitions[key] = set()
+                    transitions[key].update(targets)
+        self.final_states = set(s for s, closure in closures.items() if not closure.isdisjoint(self.final_states))
+        self.transitions = transitions
+
+    def prune(self):
+        # keep states that are reachable from a start state and can reach a final state
+        succ, pred = {}, {}
+        for (u, sym), targets in self.transitions.items():
+            for v in targets:
+                succ.setdefault(u, set()).add(v)
+                pred.setdefault(v, set()).add(u)
+
+        def reach(seeds, graph):
+            seen, stack = set(seeds), list(seeds)
+            while stack:
+                for v in graph.get(stack.pop(), ()):
+                    if v not in seen:
+                        seen.add(v)
+                        stack.append(v)
+            return seen
+
+        keep = reach(self.start_states, succ) & reach(self.final_states, pred)
+        self.transitions = {(u, sym): targets & keep for (u, sym), targets in self.transitions.items()
+                            if u in keep and targets & keep}
+        self.start_states = self.start_states & keep
+        self.final_states = self.final_states & keep
+        return keep
+
+    def merge_bisimilar(self, states):
+        # forward bisimulation by partition refinement; bisimilar states accept the same language
+        moves = {}
+        for (u, sym), targets in self.transitions.items():
+            moves.setdefault(u, []).append((sym, targets))
+        block = {s: int(s in self.final_states) for s in states}
+        while True:
+            signatures = {}
+            for s in states:
+                sig = (block[s], frozenset((sym, block[v]) for sym, targets in moves.get(s, ()) for v in targets))
+                signatures[s] = sig
+            ids = {}
+            refined = {s: ids.setdefault(sig, len(ids)) for s, sig in signatures.items()}
+            stable = len(ids) == len(set(block.values()))
+            block = refined
+            if stable: break
+
+        members = {}
+        for s in states:
+            members.setdefault(block[s], []).append(s)
+        rep = {}
+        for group in members.values():
+            head = min(group, key=lambda x: (len(x), x))
+            for s in group:
+                rep[s] = head
+        transitions = {}
+        for (u, sym), targets in self.transitions.items():
+            key = (rep[u], sym)
+            if key not in transitions: transitions[key] = set()
+            transitions[key].update(rep[v] for v in targets)
+        self.transitions = transitions
+        self.start_states = set(rep[s] for s in self.start_states)
+        self.final_states = set(rep[s] for s in self.final_states)
+        return set(rep.values())
+
+    def renumber(self, states):
+        # names the given states 1..k, the format the loaders and the GUI use, and drops every other state
+        names = {s: str(k) for k, s in enumerate(sorted(states, key=lambda x: (len(x), x)), 1)}
+        self.transitions = {(names[u], sym): set(names[v] for v in targets)
+                            for (u, sym), targets in self.transitions.items()}
+        self.start_states = set(names[s] for s in self.start_states)
+        self.final_states = set(names[s] for s in self.final_states)
+        self.states_count = len(names)
+
+    def reduce(self, epsilon=True, prune=True, merge=True):
+        states_before = len(self.all_states())
+        transitions_before = self.transition_count()
+        epsilon_before = sum(len(t) for (u, sym), t in self.transitions.items() if sym == '#')
+        if epsilon: self.remove_epsilon()
+        states = self.prune() if prune else self.all_states()
+        if merge: states = self.merge_bisimilar(states)
+        self.renumber(states)
+        self.compiled = None
+        self.closure_table = None
+        self.lazy_dfa = None
+        states_after = len(self.all_states())
+        return {'states_removed': states_before - states_after,
+                'transitions_removed': transitions_before - self.transition_count(),
+                'epsilon_removed': epsilon_before - sum(len(t) for (u, sym), t in self.transitions.items()
+                                                        if sym == '#'),
+                'states': states_after,
+                'transitions': self.transition_count()}
+
+    def to_dfa(self, max_states=None):
+        return DFA.from_compiled(self.compile(), max_states)
+
+    def minimize(self, max_states=None):
+        return self.to_dfa(max_states).minimize()
+
+    # --- Simulation API ---
+    def step(self, states, char):
+        nxt = set()
+        for s in states:
+            if (s, char) in self.transitions: nxt.update(self.transitions[(s, char)])
+        return self.get_epsilon_closure(nxt)
+
+    def steps(self, word):
+        curr = self.get_epsilon_closure(self.start_states)
+        yield None, curr
+        for char in word:
+            curr = self.step(curr, char)
+            yield char, curr
+
+    def run(self, word):
+        mask = self.run_mask(word)
+        return self.compiled.states_of(mask)
+
+    def accepts(self, word):
+        mask = self.run_mask(word)
+        accepted = bool(mask & self.compiled.final_mask)
+        if self.instrumented:
+            if self.stats:
+                if accepted: self.stats.accepted += 1
+                else: self.stats.rejected += 1
+            for fn in self.hooks['accept' if accepted else 'reject']:
+                fn(word)
+        return accepted
+
+    def stream(self, scan=False, encoding='utf-8'):
+        stepper = self.get_lazy_dfa() if self.mode == 'lazy_dfa' else self.compile()
+        c = self.compiled
+        return StreamMatcher(stepper, c.start_mask, c.final_mask, scan, encoding)
+
+    def accepts_many(self, words):
+        # the bit-parallel batch has no per-word steps to report, so instrumented engines run word by word
+        if self.instrumented: return [self.accepts(w) for w in words]
+        return self.compile().run_batch(list(words))
+
+    # --- Search ---
+    def finditer(self, text, mode='longest'):
+        # 'longest': non-overlapping leftmost-longest matches; 'all': for every end offset, the leftmost match
+        c = self.compile()
+        for _, start, end in c.scan(text, [c.final_mask], mode):
+            yield start, end
+
+    def finditer_stream(self, chunks, lookahead=1024):
+        # leftmost-longest over text arriving in chunks, e.g. iter(lambda: f.read(1 << 20), '') for a text file;
+        # see CompiledNFA.scan_stream for what `lookahead` bounds
+        c = self.compile()
+        for _, start, end in c.scan_stream(chunks, [c.final_mask], lookahead):
+            yield start, end
+
+    def search(self, text):
+        return next(self.finditer(text), None)
+
+
+class PatternSet:
+    # several automata unioned into one machine, with final states tagged by pattern id
+    def __init__(self, engines):
+        self.engine = NFAEngine()
+        self.finals = []
+        for pid, e in enumerate(engines):
+            tag = f"{pid}:"
+            self.engine.alphabet |= e.alphabet
+            for (u, sym), targets in e.transitions.items():
+                for v in targets:
+                    self.engine.add_transition(tag + u, sym, tag + v)
+            self.engine.start_states |= set(tag + x for x in e.start_states)
+            self.finals.append(set(tag + x for x in e.final_states))
+            self.engine.final_states |= self.finals[-1]
+        self.engine.states_count = 0
+
+    def finditer(self, text, mode='longest'):
+        # yields (pattern id, start, end); in 'longest' mode ties at the same span go to the lowest pattern id,
+        # in 'all' mode every pattern reports its leftmost match at each end offset
+        c = self.engine.compile()
+        return c.scan(text, [c.mask_of(f) for f in self.finals], mode)
+
+    def finditer_stream(self, chunks, lookahead=1024):
+        c = self.engine.compile()
+        return c.scan_stream(chunks, [c.mask_of(f) for f in self.finals], lookahead)
@@ -0,0 +1,210 @@
+import mmap
+import struct
+import sys
+from array import array
+
+from nfa_engine import CompiledNFA, MaskRows, NFAEngine, iter_bits
+
+MAGIC = b'NFAB'
+VERSION = 1
+SECTIONS = 12
+
+
+# --- Text format ---
+def parse_nfa(alphabet_text, states_text, starts_text, finals_text, transitions_text, progress=None):
+    engine = NFAEngine()
+
+    engine.alphabet = set(x.strip() for x in alphabet_text.split(',') if x.strip())
+    if not engine.alphabet: raise ValueError("Alphabet cannot be empty!")
+
+    states_val = states_text.strip()
+    if not states_val.isdigit():
+        raise ValueError(
+            f"Error in 'Number of States':\nExpected an integer (e.g., 4), but you entered '{states_val}'.")
+    engine.states_count = int(states_val)
+
+    raw_starts = starts_text.split(',')
+    for s in raw_starts:
+        if not s.strip().isdigit():
+            raise ValueError(f"Error in 'Start State(s)':\nExpected integer state IDs, but you entered '{s}'.")
+    engine.start_states = set(x.strip() for x in raw_starts if x.strip())
+
+    raw_finals = finals_text.split(',')
+    for f in raw_finals:
+        if f.strip() and not f.strip().isdigit():
+            raise ValueError(f"Error in 'Final State(s)':\nExpected integer state IDs, but you entered '{f}'.")
+    engine.final_states = set(x.strip() for x in raw_finals if x.strip())
+
+    parse_transitions(engine, transitions_text, progress)
+    return engine
+
+
+def parse_transitions(engine, text, progress=None):
+    raw = text.strip().split('\n')
+    rows = [line.split(',') for line in raw if line.strip()]
+    # bulk checks first; only walk line by line when something is wrong, to report where
+    if any(len(r) != 3 for r in rows): check_transition_lines(raw, engine.alphabet)
+    if ' ' in text or '\t' in text or '\r' in text:
+        rows = [(u.strip(), sym.strip(), v.strip()) for u, sym, v in rows]
+    states = set(r[0] for r in rows)
+    states.update(r[2] for r in rows)
+    symbols = set(r[1] for r in rows)
+    symbols.discard('#')
+    if not all(s.isdigit() for s in states) or not symbols <= engine.alphabet:
+        check_transition_lines(raw, engine.alphabet)
+
+    transitions = engine.transitions
+    step = 100000
+    for start in range(0, len(rows), step):
+        if progress: progress(start / len(rows), "Parsing transitions")
+        for u, sym, v in rows[start:start + step]:
+            key = (u, sym)
+            if key not in transitions: transitions[key] = set()
+            transitions[key].add(v)
+    engine.compiled = None
+    engine.closure_table = None
+    return engine
+
+
+def check_transition_lines(raw, alphabet):
+    for i, line in enumerate(raw):
+        line = line.strip()
+        if not line: continue
+        parts = line.split(',')
+
+        if len(parts) != 3:
+            raise ValueError(
+                f"Error in Line {i + 1}:\nInvalid format '{line}'.\nExpected format: from,symbol,to (e.g., 1,a,2)")
+        u, sym, v = parts[0].strip(), parts[1].strip(), parts[2].strip()
+
+        if not u.isdigit() or not v.isdigit():
+            raise ValueError(
+                f"Error in Line {i + 1}:\nState IDs must be integers.\nYou entered: from '{u}' to '{v}'")
+
+        if sym != '#' and sym not in alphabet:
+            raise ValueError(
+                f"Error in Line {i + 1}:\nSymbol '{sym}' is not in your defined Alphabet: {alphabet}")
+
+
+def load_text(path):
+    # alphabet, number of states, start states and final states on the first four lines,
+    # then one from,symbol,to transition per line
+    with open(path, encoding='utf-8') as f:
+        header = [f.readline() for _ in range(4)]
+        body = f.read()
+    return parse_nfa(*header, body)
+
+
+# --- Binary format ---
+# header: magic, version, then SECTIONS byte lengths; each section is padded to 4 bytes.
+# sections: states, symbols, alphabet (newline-joined utf-8), states_count, start and final
+# indices, epsilon closure CSR, raw transition CSR per symbol with '#' last, closed successor CSR
+def csr(rows):
+    indptr, indices = array('I', [0]), array('I')
+    for row in rows:
+        indices.extend(row)
+        indptr.append(len(indices))
+    return indptr, indices
+
+
+def save_binary(engine, path):
+    c = engine.compile()
+    n = len(c.states)
+    raw_syms = c.symbols + ['#']
+    raw_ptr, raw_idx = array('I'), array('I')
+    for sym in raw_syms:
+        rows = [sorted(c.state_index[v] for v in engine.transitions.get((s, sym), ())) for s in c.states]
+        ptr, idx = csr(rows)
+        raw_ptr.extend(x + len(raw_idx) for x in ptr)
+        raw_idx.extend(idx)
+    succ_ptr, succ_idx = array('I'), array('I')
+    for row in c.succ:
+        ptr, idx = csr([list(iter_bits(row[i])) for i in range(n)])
+        succ_ptr.extend(x + len(succ_idx) for x in ptr)
+        succ_idx.extend(idx)
+    clo_ptr, clo_idx = csr([list(iter_bits(c.closure[i])) for i in range(n)])
+
+    sections = [
+        '\n'.join(c.states).encode('utf-8'),
+        '\n'.join(c.symbols).encode('utf-8'),
+        '\n'.join(sorted(engine.alphabet)).encode('utf-8'),
+        array('I', [engine.states_count, n]).tobytes(),
+        array('I', sorted(c.state_index[s] for s in engine.start_states)).tobytes(),
+        array('I', sorted(c.state_index[s] for s in engine.final_states)).tobytes(),
+        clo_ptr.tobytes(), clo_idx.tobytes(),
+        raw_ptr.tobytes(), raw_idx.tobytes(),
+        succ_ptr.tobytes(), succ_idx.tobytes(),
+    ]
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('=II', VERSION, 1 if sys.byteorder == 'little' else 0))
+        f.write(struct.pack(f'={SECTIONS}I', *[len(s) for s in sections]))
+        for s in sections:
+            f.write(s)
+            f.write(b'\0' * (-len(s) % 4))
+
+
+def load_binary(path):
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mm)
+    if view[:4] != MAGIC: raise ValueError(f"'{path}' is not a compiled NFA file.")
+    version, little = struct.unpack_from('=II', view, 4)
+    if version != VERSION or little != (sys.byteorder == 'little'):
+        raise ValueError(f"'{path}' was written by an incompatible version or platform.")
+    lengths = struct.unpack_from(f'={SECTIONS}I', view, 12)
+    sections, off = [], 12 + 4 * SECTIONS
+    for length in lengths:
+        sections.append(view[off:off + length])
+        off += length + (-length % 4)
+
+    def text(b):
+        return str(b, 'utf-8').split('\n') if len(b) else []
+
+    states, symbols, alphabet = text(sections[0]), text(sections[1]), text(sections[2])
+    states_count, n = sections[3].cast('I')
+    starts, finals = sections[4].cast('I'), sections[5].cast('I')
+    clo_ptr, clo_idx = sections[6].cast('I'), sections[7].cast('I')
+    raw_ptr, raw_idx = sections[8].cast('I'), sections[9].cast('I')
+    succ_ptr, succ_idx = sections[10].cast('I'), sections[11].cast('I')
+
+    engine = NFAEngine()
+    engine.alphabet = set(alphabet)
+    engine.states_count = states_count
+    engine.start_states = set(states[i] for i in starts)
+    engine.final_states = set(states[i] for i in finals)
+
+    # the set-based tables are only built if something asks for them; the compiled masks read the
+    # mapped CSR arrays in place, one state at a time
+    def transitions():
+        out = {}
+        for k, sym in enumerate(symbols + ['#']):
+            base = k * (n + 1)
+            for i in range(n):
+                lo, hi = raw_ptr[base + i], raw_ptr[base + i + 1]
+                if lo != hi: out[(states[i], sym)] = set(states[j] for j in raw_idx[lo:hi])
+        return out
+
+    def closure_table():
+        return {states[i]: frozenset(states[j] for j in clo_idx[clo_ptr[i]:clo_ptr[i + 1]]) for i in range(n)}
+
+    engine.defer('transitions', transitions)
+    engine.defer('closure_table', closure_table)
+
+    c = CompiledNFA.__new__(CompiledNFA)
+    c.states = states
+    c.state_index = {s: i for i, s in enumerate(states)}
+    c.symbols = symbols
+    c.symbol_index = {s: i for i, s in enumerate(symbols)}
+    c.start_snapshot = frozenset(engine.start_states)
+    c.final_snapshot = frozenset(engine.final_states)
+    c.closure = MaskRows(clo_ptr, clo_idx, n)
+    c.succ = [MaskRows(succ_ptr, succ_idx, n, k * (n + 1)) for k in range(len(symbols))]
+    c.start_mask = 0
+    for i in starts:
+        c.start_mask |= c.closure[i]
+    c.final_mask = 0
+    for i in finals:
+        c.final_mask |= 1 << i
+    engine.compiled = c
+    return engine
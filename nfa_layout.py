@@ -0,0 +1,213 @@
+import math
+import random
+import time
+from collections import OrderedDict
+
+_cache = OrderedDict()
+CACHE_SIZE = 16
+
+
+# --- Cache ---
+def automaton_key(engine, states):
+    edges = tuple(sorted((u, sym, v) for (u, sym), targets in engine.transitions.items() for v in targets))
+    return (tuple(states), edges, tuple(sorted(engine.start_states)), tuple(sorted(engine.final_states)))
+
+
+def cached_layout(kind, key):
+    pos = _cache.get((kind, key))
+    if pos is not None: _cache.move_to_end((kind, key))
+    return pos
+
+
+def store_layout(kind, key, positions):
+    _cache[(kind, key)] = dict(positions)
+    _cache.move_to_end((kind, key))
+    if len(_cache) > CACHE_SIZE: _cache.popitem(last=False)
+
+
+def neighbours(engine, states):
+    adj = {s: set() for s in states}
+    for (u, sym), targets in engine.transitions.items():
+        if u not in adj: continue
+        for v in targets:
+            if v != u and v in adj:
+                adj[u].add(v)
+                adj[v].add(u)
+    return adj
+
+
+# --- Layouts ---
+def circle_layout(states, cx, cy, r):
+    cnt = max(1, len(states))
+    pos = {}
+    for i, s in enumerate(states, 1):
+        ang = (2 * math.pi / cnt) * i - math.pi / 2
+        pos[s] = (cx + r * math.cos(ang), cy + r * math.sin(ang))
+    return pos
+
+
+def layered_layout(engine, states, node_sep=90, layer_sep=150, sweeps=4):
+    # Sugiyama-style: BFS layers from the start states, then barycenter sweeps to cut crossings
+    succ = {s: [] for s in states}
+    for (u, sym), targets in engine.transitions.items():
+        if u in succ: succ[u].extend(v for v in targets if v in succ and v != u)
+    layer = {}
+    roots = [s for s in states if s in engine.start_states] + list(states)
+    base = 0
+    for root in roots:
+        if root in layer: continue
+        layer[root] = base
+        queue, idx = [root], 0
+        while idx < len(queue):
+            u = queue[idx]
+            idx += 1
+            for v in succ[u]:
+                if v not in layer:
+                    layer[v] = layer[u] + 1
+                    queue.append(v)
+        base = max(layer.values()) + 1
+
+    layers = [[] for _ in range(base)]
+    for s in states:
+        layers[layer[s]].append(s)
+    adj = neighbours(engine, states)
+    order = {}
+    for row in layers:
+        for j, s in enumerate(row):
+            order[s] = j
+    for sweep in range(sweeps):
+        rng = range(1, len(layers)) if sweep % 2 == 0 else range(len(layers) - 2, -1, -1)
+        ref = -1 if sweep % 2 == 0 else 1
+        for i in rng:
+            near = set(layers[i + ref])
+
+            def bary(s):
+                ps = [order[t] for t in adj[s] if t in near]
+                return sum(ps) / len(ps) if ps else order[s]
+
+            layers[i].sort(key=bary)
+            for j, s in enumerate(layers[i]):
+                order[s] = j
+
+    pos = {}
+    for i, row in enumerate(layers):
+        for j, s in enumerate(row):
+            pos[s] = (i * layer_sep, (j - (len(row) - 1) / 2) * node_sep)
+    return pos
+
+
+class ForceLayout:
+    # Fruchterman-Reingold with Barnes-Hut repulsion; step() runs whole iterations and run_for() a time slice,
+    # so callers can spread the work over event-loop ticks
+    def __init__(self, engine, positions, iterations=200, ideal=120.0, theta=0.9, seed=0):
+        self.states = list(positions)
+        self.index = {s: i for i, s in enumerate(self.states)}
+        self.xs = [positions[s][0] for s in self.states]
+        self.ys = [positions[s][1] for s in self.states]
+        adj = neighbours(engine, self.states)
+        self.edges = [(self.index[u], self.index[v]) for u in adj for v in adj[u] if u < v]
+        self.ideal = ideal
+        self.theta = theta
+        self.iterations = iterations
+        self.iteration = 0
+        span = max(max(self.xs, default=0) - min(self.xs, default=0), max(self.ys, default=0) - min(self.ys, default=0))
+        self.temperature = max(span, ideal) / 10
+        self.rng = random.Random(seed)
+        # a partly computed iteration: [quadtree, dx, dy, next node]
+        self.pending = None
+
+    @property
+    def done(self):
+        return self.iteration >= self.iterations or len(self.states) < 2
+
+    def positions(self):
+        return {s: (self.xs[i], self.ys[i]) for i, s in enumerate(self.states)}
+
+    def build_tree(self, items, x0, y0, size, depth=0):
+        # node: [mass centre x, mass centre y, mass, size, children or None, item]
+        xs, ys = self.xs, self.ys
+        mx = sum(xs[i] for i in items) / len(items)
+        my = sum(ys[i] for i in items) / len(items)
+        if len(items) == 1 or depth > 24: return [mx, my, len(items), size, None, items[0]]
+        half = size / 2
+        quads = ([], [], [], [])
+        for i in items:
+            quads[(xs[i] >= x0 + half) + 2 * (ys[i] >= y0 + half)].append(i)
+        children = []
+        for q, sub in enumerate(quads):
+            if sub: children.append(self.build_tree(sub, x0 + half * (q & 1), y0 + half * (q >> 1), half, depth + 1))
+        return [mx, my, len(items), size, children, None]
+
+    def step(self, count=1):
+        for _ in range(count):
+            if self.done: break
+            self.repel(math.inf)
+            self.move()
+        return self.done
+
+    def run_for(self, seconds):
+        # as many iterations as fit in `seconds`; an iteration that does not fit is resumed by the next call
+        deadline = time.perf_counter() + seconds
+        while not self.done:
+            if not self.repel(deadline): break
+            self.move()
+            if time.perf_counter() >= deadline: break
+        return self.done
+
+    def repel(self, deadline):
+        # Barnes-Hut repulsion for the current iteration, node by node from where the last call stopped;
+        # returns True once every node has its force
+        xs, ys, k2 = self.xs, self.ys, self.ideal * self.ideal
+        n = len(self.states)
+        if self.pending is None:
+            x0, y0 = min(xs), min(ys)
+            size = max(max(xs) - x0, max(ys) - y0) + 1
+            self.pending = [self.build_tree(list(range(n)), x0, y0, size), [0.0] * n, [0.0] * n, 0]
+        root, dx, dy, i = self.pending
+        theta2 = self.theta * self.theta
+        while i < n:
+            if deadline is not math.inf and time.perf_counter() >= deadline: break
+            xi, yi = xs[i], ys[i]
+            fx = fy = 0.0
+            stack = [root]
+            while stack:
+                node = stack.pop()
+                ddx, ddy = xi - node[0], yi - node[1]
+                d2 = ddx * ddx + ddy * ddy
+                if node[4] is not None and node[3] * node[3] > theta2 * d2:
+                    stack.extend(node[4])
+                    continue
+                if node[5] == i and node[2] == 1: continue
+                if d2 < 1e-6:
+                    ddx, ddy = self.rng.uniform(-1, 1), self.rng.uniform(-1, 1)
+                    d2 = ddx * ddx + ddy * ddy
+                f = k2 * node[2] / d2
+                fx += ddx * f
+                fy += ddy * f
+            dx[i], dy[i] = fx, fy
+            i += 1
+        self.pending[3] = i
+        return i == n
+
+    def move(self):
+        # spring forces along edges, then every node moves at most the current temperature
+        xs, ys = self.xs, self.ys
+        _, dx, dy, _ = self.pending
+        self.pending = None
+        for a, b in self.edges:
+            ddx, ddy = xs[a] - xs[b], ys[a] - ys[b]
+            d = math.hypot(ddx, ddy) or 1e-3
+            f = d / self.ideal
+            dx[a] -= ddx * f
+            dy[a] -= ddy * f
+            dx[b] += ddx * f
+            dy[b] += ddy * f
+        t = self.temperature
+        for i in range(len(self.states)):
+            d = math.hypot(dx[i], dy[i])
+            if d > 0:
+                lim = min(d, t) / d
+                xs[i] += dx[i] * lim
+                ys[i] += dy[i] * lim
+        self.temperature = max(t * 0.97, 1.0)
+        self.iteration += 1
@@ -0,0 +1,219 @@
+from collections import OrderedDict
+
+from nfa_engine import NFAEngine
+
+_cache = OrderedDict()
+CACHE_SIZE = 256
+
+
+# --- Parser ---
+# AST: ('sym', chars) | ('eps',) | ('cat', a, b) | ('alt', a, b) | ('star', a) | ('plus', a) | ('opt', a)
+class RegexParser:
+    def __init__(self, pattern, alphabet=None):
+        self.pattern = pattern
+        self.pos = 0
+        self.alphabet = set(alphabet) if alphabet else None
+
+    def error(self, msg):
+        return ValueError(f"Regex error at position {self.pos} in '{self.pattern}': {msg}")
+
+    def peek(self):
+        return self.pattern[self.pos] if self.pos < len(self.pattern) else None
+
+    def take(self):
+        c = self.peek()
+        self.pos += 1
+        return c
+
+    def parse(self):
+        node = self.parse_alt()
+        if self.peek() is not None: raise self.error(f"unexpected '{self.peek()}'")
+        return node
+
+    def parse_alt(self):
+        node = self.parse_cat()
+        while self.peek() == '|':
+            self.take()
+            node = ('alt', node, self.parse_cat())
+        return node
+
+    def parse_cat(self):
+        node = None
+        while self.peek() is not None and self.peek() not in '|)':
+            item = self.parse_repeat()
+            node = item if node is None else ('cat', node, item)
+        return node or ('eps',)
+
+    def parse_repeat(self):
+        node = self.parse_atom()
+        while self.peek() is not None and self.peek() in '*+?':
+            node = ({'*': 'star', '+': 'plus', '?': 'opt'}[self.take()], node)
+        return node
+
+    def parse_atom(self):
+        c = self.take()
+        if c == '(':
+            node = self.parse_alt()
+            if self.take() != ')': raise self.error("missing ')'")
+            return node
+        if c == '[': return ('sym', self.parse_class())
+        if c == '.':
+            if not self.alphabet: raise self.error("'.' needs an alphabet")
+            return ('sym', frozenset(self.alphabet))
+        if c in ('*', '+', '?'): raise self.error(f"nothing to repeat before '{c}'")
+        if c == ')': raise self.error("unbalanced ')'")
+        if c == '\\': c = self.escaped()
+        return ('sym', frozenset(self.literal(c)))
+
+    def escaped(self):
+        c = self.take()
+        if c is None: raise self.error("dangling '\\'")
+        return c
+
+    def literal(self, c):
+        if c == '#': raise self.error("'#' is reserved for lambda moves")
+        return c
+
+    def parse_class(self):
+        negate = self.peek() == '^'
+        if negate: self.take()
+        chars = set()
+        first = True
+        while True:
+            c = self.take()
+            if c is None: raise self.error("missing ']'")
+            if c == ']' and not first: break
+            first = False
+            if c == '\\': c = self.escaped()
+            if self.peek() == '-' and self.pos + 1 < len(self.pattern) and self.pattern[self.pos + 1] != ']':
+                self.take()
+                end = self.take()
+                if end == '\\': end = self.escaped()
+                if ord(end) < ord(c): raise self.error(f"bad range '{c}-{end}'")
+                chars.update(chr(x) for x in range(ord(c), ord(end) + 1))
+            else:
+                chars.add(c)
+        if negate:
+            if not self.alphabet: raise self.error("negated class needs an alphabet")
+            chars = self.alphabet - chars
+        for c in chars:
+            self.literal(c)
+        if not chars: raise self.error("empty character class")
+        return frozenset(chars)
+
+
+def symbols_of(node):
+    if node[0] == 'sym': return set(node[1])
+    out = set()
+    for child in node[1:]:
+        out |= symbols_of(child)
+    return out
+
+
+# --- Thompson ---
+def thompson(node, engine):
+    counter = [0]
+
+    def new_state():
+        counter[0] += 1
+        return str(counter[0])
+
+    def build(n):
+        kind = n[0]
+        if kind == 'sym' or kind == 'eps':
+            s, e = new_state(), new_state()
+            for c in (n[1] if kind == 'sym' else '#'):
+                engine.add_transition(s, c, e)
+            return s, e
+        if kind == 'cat':
+            s1, e1 = build(n[1])
+            s2, e2 = build(n[2])
+            engine.add_transition(e1, '#', s2)
+            return s1, e2
+        if kind == 'alt':
+            s, e = new_state(), new_state()
+            for child in n[1:]:
+                cs, ce = build(child)
+                engine.add_transition(s, '#', cs)
+                engine.add_transition(ce, '#', e)
+            return s, e
+        s, e = new_state(), new_state()
+        cs, ce = build(n[1])
+        engine.add_transition(s, '#', cs)
+        engine.add_transition(ce, '#', e)
+        if kind in ('star', 'plus'): engine.add_transition(ce, '#', cs)
+        if kind in ('star', 'opt'): engine.add_transition(s, '#', e)
+        return s, e
+
+    start, end = build(node)
+    engine.start_states = {start}
+    engine.final_states = {end}
+    engine.states_count = counter[0]
+
+
+# --- Glushkov ---
+def glushkov(node, engine):
+    positions = []
+    follow = {}
+
+    # returns (nullable, first, last) over position indices, filling follow as it goes
+    def walk(n):
+        kind = n[0]
+        if kind == 'eps': return True, set(), set()
+        if kind == 'sym':
+            positions.append(n[1])
+            p = len(positions)
+            follow[p] = set()
+            return False, {p}, {p}
+        if kind == 'cat':
+            n1, f1, l1 = walk(n[1])
+            n2, f2, l2 = walk(n[2])
+            for p in l1:
+                follow[p] |= f2
+            return n1 and n2, f1 | f2 if n1 else f1, l1 | l2 if n2 else l2
+        if kind == 'alt':
+            n1, f1, l1 = walk(n[1])
+            n2, f2, l2 = walk(n[2])
+            return n1 or n2, f1 | f2, l1 | l2
+        nul, first, last = walk(n[1])
+        if kind in ('star', 'plus'):
+            for p in last:
+                follow[p] |= first
+        return nul or kind != 'plus', first, last
+
+    nullable, first, last = walk(node)
+    # state "1" is the initial state, position p is state p + 1
+    for p in first:
+        for c in positions[p - 1]:
+            engine.add_transition('1', c, str(p + 1))
+    for p, targets in follow.items():
+        for q in targets:
+            for c in positions[q - 1]:
+                engine.add_transition(str(p + 1), c, str(q + 1))
+    engine.start_states = {'1'}
+    engine.final_states = set(str(p + 1) for p in last)
+    if nullable: engine.final_states.add('1')
+    engine.states_count = len(positions) + 1
+
+
+def compile_regex(pattern, method='glushkov', alphabet=None):
+    # the cache keeps the built automaton; every call gets its own copy, so callers may reduce or instrument it
+    key = (pattern, method, frozenset(alphabet) if alphabet else None)
+    engine = _cache.get(key)
+    if engine is not None:
+        _cache.move_to_end(key)
+        return engine.copy()
+    if method not in ('glushkov', 'thompson'): raise ValueError(f"Unknown regex construction '{method}'")
+
+    node = RegexParser(pattern, alphabet).parse()
+    engine = NFAEngine()
+    engine.alphabet = symbols_of(node) | set(alphabet or ())
+    if method == 'thompson':
+        thompson(node, engine)
+    else:
+        glushkov(node, engine)
+    engine.compile()
+
+    _cache[key] = engine
+    if len(_cache) > CACHE_SIZE: _cache.popitem(last=False)
+    return engine.copy()
@@ -0,0 +1,348 @@
+import math
+from xml.sax.saxutils import escape
+
+ROW_HEIGHT = 120
+TOP_MARGIN = 80
+NODE_R = 20
+ARROW = (14, 16, 6)
+PROGRESS_EVERY = 1000
+
+
+class TraceNode:
+    __slots__ = ('id', 'state', 'parents')
+
+    def __init__(self, node_id, state, parents):
+        self.id = node_id
+        self.state = state
+        # (parent id, vertical) pairs; vertical links come from the previous level, the rest are lambda moves
+        self.parents = parents
+
+
+class TraceTree:
+    # computation tree built one level at a time, on demand
+    def __init__(self, engine, input_string, dag=False, node_budget=5000):
+        self.engine = engine
+        self.input_string = input_string
+        self.dag = dag
+        self.node_budget = node_budget
+        self.levels = []
+        self.node_count = 0
+        self.truncated = False
+        self.total_levels = len(input_string) + 1
+        # progress(fraction, text) while a level is being built; it may raise to abort the level
+        self.progress = None
+
+    @property
+    def done(self):
+        return len(self.levels) >= self.total_levels
+
+    def new_node(self, state, parents):
+        if self.node_count >= self.node_budget:
+            self.truncated = True
+            return None
+        self.node_count += 1
+        if self.progress is not None and self.node_count % PROGRESS_EVERY == 0:
+            self.progress(self.node_count / self.node_budget, "Building trace")
+        return TraceNode(self.node_count, state, parents)
+
+    def next_level(self, progress=None):
+        if self.done: return None
+        count, truncated = self.node_count, self.truncated
+        self.progress = progress
+        try:
+            level = self.build_level()
+        except BaseException:
+            # an aborted level leaves the tree as it was
+            self.node_count, self.truncated = count, truncated
+            raise
+        finally:
+            self.progress = None
+        self.levels.append(level)
+        return level
+
+    def build_level(self):
+        i = len(self.levels)
+        if i == 0:
+            char = 'Start'
+            nodes = []
+            for s in sorted(self.engine.start_states):
+                node = self.new_node(s, [])
+                if node: nodes.append(node)
+        else:
+            char = self.input_string[i - 1]
+            nodes = self.step_nodes(self.levels[-1]['nodes'], char, i == self.total_levels - 1)
+        self.expand_lambda(nodes)
+        level = {'nodes': nodes, 'char': char}
+        self.layout(level)
+        return level
+
+    def layout(self, level):
+        # x position of every node, computed once when the level is built
+        nodes = level['nodes']
+        nodes.sort(key=lambda x: x.parents[0][0] if x.parents else -1)
+        count = len(nodes)
+        width_span = max(600, count * 100)
+        spacing = width_span / (count + 1)
+        offset_x = (1000 - width_span) / 2 if width_span < 1000 else 50
+        level['x'] = {node.id: offset_x + spacing * (j + 1) for j, node in enumerate(nodes)}
+        level['width'] = offset_x + width_span
+
+    def extent(self, upto=None):
+        upto = len(self.levels) if upto is None else upto
+        width = max([1000] + [level['width'] + 100 for level in self.levels[:upto]])
+        return width, level_y(upto) + ROW_HEIGHT
+
+    def build_all(self, progress=None):
+        while self.next_level(progress) is not None:
+            pass
+        return self.levels
+
+    def step_nodes(self, parents, char, is_last_step):
+        transitions = self.engine.transitions
+        merge = self.dag or is_last_step
+        merged = {}
+        nodes = []
+        for parent in parents:
+            for t in transitions.get((parent.state, char), ()):
+                if merge and t in merged:
+                    merged[t].parents.append((parent.id, True))
+                    continue
+                node = self.new_node(t, [(parent.id, True)])
+                if node is None: return nodes
+                nodes.append(node)
+                if merge: merged[t] = node
+        return nodes
+
+    def expand_lambda(self, nodes):
+        transitions = self.engine.transitions
+        if self.dag:
+            by_state = {n.state: n for n in nodes}
+            idx = 0
+            while idx < len(nodes):
+                curr = nodes[idx]
+                idx += 1
+                for t in transitions.get((curr.state, '#'), ()):
+                    if t in by_state:
+                        other = by_state[t]
+                        if other is not curr and (curr.id, False) not in other.parents:
+                            other.parents.append((curr.id, False))
+                        continue
+                    node = self.new_node(t, [(curr.id, False)])
+                    if node is None: return
+                    by_state[t] = node
+                    nodes.append(node)
+            return
+
+        # tree mode: a branch stops at a state it already passed through on this level's lambda path
+        seen = {n.id: frozenset((n.state,)) for n in nodes}
+        idx = 0
+        while idx < len(nodes):
+            curr = nodes[idx]
+            idx += 1
+            path = seen[curr.id]
+            for t in transitions.get((curr.state, '#'), ()):
+                if t in path: continue
+                node = self.new_node(t, [(curr.id, False)])
+                if node is None: return
+                seen[node.id] = path | {t}
+                nodes.append(node)
+
+    def accepted(self):
+        if self.truncated or not self.done: return self.engine.accepts(self.input_string)
+        return any(n.state in self.engine.final_states for n in self.levels[-1]['nodes'])
+
+
+def level_y(i):
+    return TOP_MARGIN + i * ROW_HEIGHT
+
+
+def trace_primitives(tree, upto=None, view=None):
+    # drawing commands for the first `upto` levels, limited to those touching the view rectangle:
+    # ('line', coords, opts), ('oval', bbox, opts) and ('text', (x, y), opts)
+    upto = len(tree.levels) if upto is None else upto
+    vx0, vy0, vx1, vy1 = view or (-math.inf, -math.inf, math.inf, math.inf)
+    width = tree.extent(upto)[0]
+    finals = tree.engine.final_states
+    last = tree.total_levels - 1
+    r = NODE_R
+
+    def seen(x0, y0, x1, y1):
+        return x0 <= vx1 and x1 >= vx0 and y0 <= vy1 and y1 >= vy0
+
+    if seen(20, 20, 100, 60):
+        yield 'text', (60, 40), {'text': "Start", 'font': ("Arial", 14, "bold"), 'fill': "black"}
+    for i in range(upto):
+        line_y = level_y(i)
+        # edges into a level reach up to the previous row
+        if not seen(0, line_y - ROW_HEIGHT, width, line_y + ROW_HEIGHT): continue
+        if seen(20, line_y, width - 100, line_y):
+            yield 'line', (20, line_y, width - 100, line_y), {'fill': "#90caf9", 'width': 2}
+        if i < last and seen(40, line_y + ROW_HEIGHT / 2 - 12, 80, line_y + ROW_HEIGHT / 2 + 12):
+            yield 'text', (60, line_y + ROW_HEIGHT / 2), {'text': tree.input_string[i],
+                                                          'font': ("Arial", 16, "bold"), 'fill': "#1565c0"}
+
+        level = tree.levels[i]
+        xs = level['x']
+        prev = tree.levels[i - 1]['x'] if i else {}
+        nodes = level['nodes']
+        for node in nodes:
+            x = xs[node.id]
+            for pid, vertical in node.parents:
+                if vertical:
+                    px = prev.get(pid)
+                    if px is None: continue
+                    py = line_y - ROW_HEIGHT
+                    if seen(min(px, x), py, max(px, x), line_y):
+                        yield 'line', (px, py + r, x, line_y - r), {'fill': "black", 'width': 2, 'arrow': True}
+                else:
+                    px = xs.get(pid)
+                    if px is None: continue
+                    if x > px:
+                        sx, ex = px + r, x - r
+                    else:
+                        sx, ex = px - r, x + r
+                    mid_x = (sx + ex) / 2
+                    mid_y = line_y - 45
+                    if seen(min(sx, ex), mid_y - 20, max(sx, ex), line_y):
+                        yield 'line', (sx, line_y - r / 2, mid_x, mid_y, ex, line_y - r / 2), \
+                            {'fill': "red", 'width': 2, 'arrow': True, 'dash': True, 'smooth': True}
+                        yield 'text', (mid_x, mid_y - 10), {'text': "\u03bb", 'font': ("Times", 14, "bold"),
+                                                             'fill': "red"}
+
+        for node in nodes:
+            x = xs[node.id]
+            if not seen(x - r, line_y - r, x + r, line_y + r): continue
+            state_name = node.state
+            fill, outline, line_width = "white", "black", 1
+            if i == last and state_name in finals:
+                fill, outline, line_width = "#c8e6c9", "#2e7d32", 2
+            yield 'oval', (x - r, line_y - r, x + r, line_y + r), {'fill': fill, 'outline': outline,
+                                                                   'width': line_width}
+            if state_name in finals:
+                inner_col = "#2e7d32" if i == last else "black"
+                yield 'oval', (x - (r - 5), line_y - (r - 5), x + (r - 5), line_y + (r - 5)), \
+                    {'fill': "", 'outline': inner_col, 'width': 1}
+            yield 'text', (x, line_y), {'text': str(state_name), 'font': ("Arial", 11, "bold"), 'fill': "black"}
+
+
+# --- Export ---
+def export_svg(tree, path, upto=None):
+    width, height = tree.extent(upto)
+    out = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:g}" height="{height:g}" '
+           f'viewBox="0 0 {width:g} {height:g}">',
+           '<defs>']
+    for name, colour in (("black", "black"), ("red", "red")):
+        length, _, half = ARROW
+        out.append(f'<marker id="arrow-{name}" markerWidth="{length}" markerHeight="{2 * half}" '
+                   f'refX="{length}" refY="{half}" orient="auto" markerUnits="userSpaceOnUse">'
+                   f'<path d="M0,0 L{length},{half} L0,{2 * half} z" fill="{colour}"/></marker>')
+    out.append('</defs>')
+    out.append('<rect width="100%" height="100%" fill="white"/>')
+    for kind, coords, opts in trace_primitives(tree, upto):
+        if kind == 'line':
+            attrs = f'fill="none" stroke="{opts["fill"]}" stroke-width="{opts["width"]}"'
+            if opts.get('dash'): attrs += ' stroke-dasharray="4,2"'
+            if opts.get('arrow'): attrs += f' marker-end="url(#arrow-{opts["fill"]})"'
+            if opts.get('smooth'):
+                x0, y0, cx, cy, x1, y1 = coords
+                out.append(f'<path d="M{x0:g},{y0:g} Q{cx:g},{cy:g} {x1:g},{y1:g}" {attrs}/>')
+            else:
+                points = " ".join(f"{coords[k]:g},{coords[k + 1]:g}" for k in range(0, len(coords), 2))
+                out.append(f'<polyline points="{points}" {attrs}/>')
+        elif kind == 'oval':
+            x0, y0, x1, y1 = coords
+            fill = opts['fill'] or "none"
+            out.append(f'<ellipse cx="{(x0 + x1) / 2:g}" cy="{(y0 + y1) / 2:g}" rx="{(x1 - x0) / 2:g}" '
+                       f'ry="{(y1 - y0) / 2:g}" fill="{fill}" stroke="{opts["outline"]}" '
+                       f'stroke-width="{opts["width"]}"/>')
+        else:
+            family, size, weight = opts['font']
+            out.append(f'<text x="{coords[0]:g}" y="{coords[1]:g}" font-family="{family}" font-size="{size}" '
+                       f'font-weight="{weight}" fill="{opts["fill"]}" text-anchor="middle" '
+                       f'dominant-baseline="central">{escape(opts["text"])}</text>')
+    out.append('</svg>')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(out) + "\n")
+
+
+def ps_colour(colour):
+    named = {"black": (0, 0, 0), "white": (1, 1, 1), "red": (1, 0, 0)}
+    if colour in named: return "%g %g %g setrgbcolor" % named[colour]
+    return "%.3f %.3f %.3f setrgbcolor" % tuple(int(colour[k:k + 2], 16) / 255 for k in (1, 3, 5))
+
+
+def ps_string(text):
+    out = []
+    for ch in text:
+        if ch in "()\\":
+            out.append("\\" + ch)
+        elif 32 <= ord(ch) < 127:
+            out.append(ch)
+        else:
+            out.append("?")
+    return "(" + "".join(out) + ")"
+
+
+def export_postscript(tree, path, upto=None):
+    # one page sized to the whole trace; canvas y grows downwards, so every y is flipped
+    width, height = tree.extent(upto)
+    out = ["%!PS-Adobe-3.0 EPSF-3.0", f"%%BoundingBox: 0 0 {math.ceil(width)} {math.ceil(height)}",
+           "%%EndComments", "1 setlinejoin"]
+
+    def arrow_head(x0, y0, x1, y1):
+        # filled triangle with its tip on (x1, y1), pointing along the last segment
+        length, _, half = ARROW
+        angle = math.atan2(y1 - y0, x1 - x0)
+        bx, by = x1 - length * math.cos(angle), y1 - length * math.sin(angle)
+        dx, dy = half * math.sin(angle), -half * math.cos(angle)
+        out.append(f"newpath {x1:.2f} {y1:.2f} moveto {bx + dx:.2f} {by + dy:.2f} lineto "
+                   f"{bx - dx:.2f} {by - dy:.2f} lineto closepath fill")
+
+    for kind, coords, opts in trace_primitives(tree, upto):
+        if kind == 'line':
+            pts = [(coords[k], height - coords[k + 1]) for k in range(0, len(coords), 2)]
+            out.append(ps_colour(opts['fill']) + f" {opts['width']} setlinewidth")
+            out.append("[4 2] 0 setdash" if opts.get('dash') else "[] 0 setdash")
+            path_ops = f"newpath {pts[0][0]:.2f} {pts[0][1]:.2f} moveto "
+            if opts.get('smooth'):
+                (x0, y0), (cx, cy), (x1, y1) = pts
+                c1 = (x0 + 2 * (cx - x0) / 3, y0 + 2 * (cy - y0) / 3)
+                c2 = (x1 + 2 * (cx - x1) / 3, y1 + 2 * (cy - y1) / 3)
+                path_ops += f"{c1[0]:.2f} {c1[1]:.2f} {c2[0]:.2f} {c2[1]:.2f} {x1:.2f} {y1:.2f} curveto"
+                tail = (cx, cy)
+            else:
+                path_ops += " ".join(f"{x:.2f} {y:.2f} lineto" for x, y in pts[1:])
+                tail = pts[-2]
+            out.append(path_ops + " stroke")
+            if opts.get('arrow'):
+                out.append("[] 0 setdash")
+                arrow_head(tail[0], tail[1], *pts[-1])
+        elif kind == 'oval':
+            x0, y0, x1, y1 = coords
+            cx, cy, rad = (x0 + x1) / 2, height - (y0 + y1) / 2, (x1 - x0) / 2
+            circle = f"newpath {cx:.2f} {cy:.2f} {rad:.2f} 0 360 arc closepath"
+            out.append("[] 0 setdash")
+            if opts['fill']: out.append(f"{circle} {ps_colour(opts['fill'])} fill")
+            out.append(f"{circle} {ps_colour(opts['outline'])} {opts['width']} setlinewidth stroke")
+        else:
+            family, size, weight = opts['font']
+            text = opts['text']
+            if text == "\u03bb":
+                font, text = "/Symbol", "l"
+            else:
+                font = "/Times-Bold" if family == "Times" else "/Helvetica-Bold"
+            x, y = coords[0], height - coords[1]
+            s = ps_string(text)
+            out.append(f"{font} findfont {size} scalefont setfont {ps_colour(opts['fill'])} "
+                       f"{x:.2f} {s} stringwidth pop 2 div sub {y - size * 0.35:.2f} moveto {s} show")
+    out.append("showpage")
+    out.append("%%EOF")
+    with open(path, 'w', encoding='ascii') as f:
+        f.write("\n".join(out) + "\n")
+
+
+def export_trace(tree, path, upto=None):
+    if path.lower().endswith(('.ps', '.eps')):
+        export_postscript(tree, path, upto)
+    else:
+        export_svg(tree, path, upto)
@@ -0,0 +1,63 @@
+import queue
+import threading
+
+
+class Cancelled(Exception):
+    pass
+
+
+class BackgroundTask:
+    # runs fn(task) on a daemon thread; results come back to the Tk thread through after() polling
+    def __init__(self, fn, on_done=None, on_error=None, on_progress=None, poll_ms=50):
+        self.fn = fn
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.poll_ms = poll_ms
+        self.events = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.finished = False
+
+    # called from the worker: report progress and stop early if the UI cancelled
+    def progress(self, fraction, text=""):
+        if self.cancel_event.is_set(): raise Cancelled()
+        self.events.put(('progress', (fraction, text)))
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def start(self, root):
+        self.root = root
+        threading.Thread(target=self.run, daemon=True).start()
+        root.after(self.poll_ms, self.poll)
+        return self
+
+    def run(self):
+        try:
+            result = self.fn(self)
+            if self.cancelled: raise Cancelled()
+        except Exception as e:
+            self.events.put(('error', e))
+        else:
+            self.events.put(('done', result))
+
+    def poll(self):
+        while True:
+            try:
+                kind, value = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'progress':
+                if self.on_progress and not self.cancelled: self.on_progress(*value)
+                continue
+            self.finished = True
+            if kind == 'done':
+                if self.on_done: self.on_done(value)
+            elif self.on_error:
+                self.on_error(value)
+            return
+        self.root.after(self.poll_ms, self.poll)
@@ -0,0 +1,222 @@
+import io
+import itertools
+import pickle
+import random
+import re
+
+from nfa_engine import DFA, NFAEngine, PatternSet
+from nfa_io import load_binary, save_binary
+from nfa_regex import compile_regex
+
+PATTERNS = ['ab', 'a*b', '(a|b)*c', 'b+', 'a?', 'ca*', '(ab|a)(bc|c)?', 'c', 'b*']
+
+
+def random_nfa(rng, alpha='ab'):
+    n = rng.randint(1, 8)
+    e = NFAEngine()
+    e.alphabet = set(alpha)
+    e.states_count = n
+    e.start_states = set(str(rng.randint(1, n)) for _ in range(rng.randint(1, 2)))
+    e.final_states = set(str(rng.randint(1, n)) for _ in range(rng.randint(0, 3)))
+    for _ in range(rng.randint(0, 3 * n)):
+        e.add_transition(str(rng.randint(1, n)), rng.choice(list(alpha) + ['#']), str(rng.randint(1, n)))
+    return e
+
+
+def all_words(alpha, max_len):
+    for length in range(max_len + 1):
+        for w in itertools.product(alpha, repeat=length):
+            yield ''.join(w)
+
+
+def test_minimize_keeps_language():
+    T, F = True, False
+    dfa = DFA(['a', 'b'], [1, 2, 2, 3, 2, 2, 4, 2, 3, 5, 6, 7, 2, 8, 9, 10, 2, 7, 9, 5, 9, 10],
+              [F, F, F, T, F, F, F, T, F, T, T], 0)
+    small = dfa.minimize()
+    for w in all_words('ab', 6):
+        assert small.accepts(w) == dfa.accepts(w), w
+
+
+def test_minimize_matches_subset_construction():
+    rng = random.Random(5)
+    for _ in range(500):
+        engine = random_nfa(rng)
+        dfa = engine.to_dfa()
+        small = dfa.minimize()
+        assert small.states_count <= dfa.states_count
+        for w in all_words('ab', 6):
+            assert small.accepts(w) == dfa.accepts(w), w
+
+
+def all_matches(patterns, text):
+    # brute force: for every end offset, the leftmost match of each pattern
+    out = []
+    for end in range(len(text) + 1):
+        for pid, p in enumerate(patterns):
+            for start in range(end + 1):
+                if re.fullmatch(p, text[start:end]):
+                    out.append((pid, start, end))
+                    break
+    return out
+
+
+def longest_matches(patterns, text):
+    # brute force: non-overlapping leftmost-longest, lowest pattern id on ties, no empty match where one ended
+    out = []
+    pos, no_empty_at = 0, -1
+    while pos <= len(text):
+        found = None
+        for start in range(pos, len(text) + 1):
+            for end in range(len(text), start - 1, -1):
+                if start == end == no_empty_at: continue
+                hit = [pid for pid, p in enumerate(patterns) if re.fullmatch(p, text[start:end])]
+                if hit:
+                    found = (hit[0], start, end)
+                    break
+            if found: break
+        if not found: break
+        out.append(found)
+        pos = no_empty_at = found[2]
+    return out
+
+
+def test_finditer_matches_oracle():
+    rng = random.Random(4)
+    for _ in range(300):
+        chosen = rng.sample(PATTERNS, rng.randint(1, 3))
+        text = ''.join(rng.choice('abcx') for _ in range(rng.randint(0, 10)))
+        method = rng.choice(['thompson', 'glushkov'])
+        patterns = PatternSet([compile_regex(p, method) for p in chosen])
+        expected = longest_matches(chosen, text)
+        assert list(patterns.finditer(text)) == expected, (chosen, text)
+        chunks = [text[k:k + 3] for k in range(0, len(text), 3)]
+        assert list(patterns.finditer_stream(chunks)) == expected, (chosen, text)
+    engine = compile_regex('a+b')
+    assert list(engine.finditer('xxaab ab')) == [(2, 5), (6, 8)]
+    assert engine.search('xxaab ab') == (2, 5)
+
+
+def test_longest_scan_is_linear():
+    # 'a|a*b' over a run of a's used to re-read the rest of the text after every match
+    engine = compile_regex('a|a*b')
+    compiled = engine.compile()
+    steps = [0]
+    step = compiled.step
+
+    def counting_step(mask, char):
+        steps[0] += 1
+        return step(mask, char)
+
+    compiled.step = counting_step
+    for n in (1000, 4000):
+        steps[0] = 0
+        assert len(list(engine.finditer('a' * n))) == n
+        assert steps[0] <= 2 * n
+    assert list(engine.finditer('a' * 50 + 'b')) == [(0, 51)]
+
+
+def test_stream_lookahead_bounds_rereading():
+    engine = compile_regex('a|a*b')
+    compiled = engine.compile()
+    steps = [0]
+    step = compiled.step
+
+    def counting_step(mask, char):
+        steps[0] += 1
+        return step(mask, char)
+
+    compiled.step = counting_step
+    chunks = ['a' * 100] * 40
+    assert len(list(engine.finditer_stream(chunks, lookahead=8))) == 4000
+    assert steps[0] <= 4000 * 10
+    # a longer match beyond the lookahead is given up for the shorter one already found
+    assert list(engine.finditer_stream(['aaab'], lookahead=1)) == [(0, 1), (1, 2), (2, 4)]
+    assert list(engine.finditer_stream(['aa', 'ab'], lookahead=8)) == [(0, 4)]
+
+
+def test_all_mode_reports_every_pattern():
+    patterns = PatternSet([compile_regex('b'), compile_regex('ab')])
+    assert list(patterns.finditer('ab', 'all')) == [(0, 1, 2), (1, 0, 2)]
+
+    rng = random.Random(3)
+    for _ in range(300):
+        chosen = rng.sample(PATTERNS, rng.randint(1, 3))
+        text = ''.join(rng.choice('abcx') for _ in range(rng.randint(0, 10)))
+        method = rng.choice(['thompson', 'glushkov'])
+        patterns = PatternSet([compile_regex(p, method) for p in chosen])
+        assert list(patterns.finditer(text, 'all')) == all_matches(chosen, text), (chosen, text)
+
+
+def test_reduce_keeps_language_and_removes_states():
+    rng = random.Random(6)
+    for _ in range(300):
+        engine = random_nfa(rng)
+        words = list(all_words('ab', 6))
+        expected = [engine.accepts(w) for w in words]
+        report = engine.reduce()
+        assert [engine.accepts(w) for w in words] == expected
+        assert engine.all_states() == set(str(k) for k in range(1, engine.states_count + 1))
+        assert len(engine.compile().states) == report['states'] == engine.states_count
+
+    engine = compile_regex('(a|b)*abb', 'thompson')
+    report = engine.reduce()
+    assert report['states_removed'] == 10
+    assert sorted(engine.compile().states, key=int) == ['1', '2', '3', '4']
+
+
+def test_binary_engine_is_lazy_and_picklable(tmp_path):
+    rng = random.Random(8)
+    words = list(all_words('ab', 5))
+    for k in range(50):
+        engine = random_nfa(rng)
+        path = str(tmp_path / f"{k}.nfab")
+        save_binary(engine, path)
+        expected = [engine.accepts(w) for w in words]
+        loaded = load_binary(path)
+        assert 'transitions' not in loaded.__dict__
+        assert [loaded.accepts(w) for w in words] == expected
+        compiled = pickle.loads(pickle.dumps(loaded.compile()))
+        assert [bool(compiled.run(w) & compiled.final_mask) for w in words] == expected
+        copy = pickle.loads(pickle.dumps(load_binary(path)))
+        assert copy.transitions == engine.transitions
+        assert [copy.accepts(w) for w in words] == expected
+
+
+def test_accepts_many_matches_accepts():
+    # NUL used to mark word ends in the batch and cut words containing it short
+    engine = compile_regex('a')
+    assert engine.accepts_many(['a\0a', 'a', '\0', '']) == [False, True, False, False]
+
+    rng = random.Random(9)
+    for _ in range(200):
+        engine = random_nfa(rng, 'ab\0')
+        words = [''.join(rng.choice('ab\0') for _ in range(rng.randint(0, 6))) for _ in range(20)]
+        assert engine.accepts_many(words) == [engine.accepts(w) for w in words], words
+
+
+def test_stream_decodes_characters_split_across_chunks():
+    engine = compile_regex('é+')
+    matcher = engine.stream()
+    for b in 'éé'.encode():
+        matcher.feed(bytes([b]))
+    assert matcher.finish() is True
+
+    scanner = engine.stream(scan=True)
+    assert [scanner.feed(bytes([b])) for b in 'éé'.encode()] == [[], [1], [], [2]]
+    assert scanner.finish() == []
+
+    # the empty word matches at offset 0 even when no chunk is ever fed
+    assert compile_regex('a*').stream(scan=True).feed_file(io.BytesIO(b'')) == [0]
+
+
+def test_compile_regex_returns_private_engines():
+    first = compile_regex('(a|b)*abb', 'thompson')
+    states = first.states_count
+    first.reduce()
+    first.add_hook('accept', lambda word: None)
+    first.add_transition('1', 'c', '1')
+    second = compile_regex('(a|b)*abb', 'thompson')
+    assert second.states_count == states
+    assert not second.instrumented and not second.hooks['accept']
+    assert second.accepts('babb') and not second.accepts('cabb')